@@ -0,0 +1,518 @@
+"""
+Asyncio pipeline for Document Assignment & Labelling application.
+Runs blob upload, Document Intelligence OCR and LLM classification on the async Azure SDK clients.
+
+Every remote call goes through the resilience layer (retries, circuit breaker, concurrency limit);
+the SDK clients' own retry policies are disabled so retries are not multiplied.
+
+All coroutines run on one long-lived event loop in a background thread, so the aio clients and
+their connection pools are reused across Streamlit sessions. Synchronous callers use run_sync()
+or submit(), which return plain concurrent.futures results.
+"""
+
+import asyncio
+import copy
+import gzip
+import json
+import threading
+import time
+
+import aiohttp
+import httpx
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
+from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+from azure.ai.inference.aio import ChatCompletionsClient
+from azure.ai.inference.models import SystemMessage, UserMessage
+
+from caching import ocr_cache, ocr_cache_key, llm_result_cache, llm_cache_key
+from classification import (
+    JsonObjectScanner, budget_document_text, build_user_prompt, build_mistral_payload,
+    estimate_tokens, parse_model_response
+)
+from hedging import first_success
+from model_router import ModelRouter, latency_tracker
+from ocr_polling import AdaptivePolling
+from ocr_preprocessing import preprocess_for_ocr
+from pdf_pages import format_page_ranges, merge_page_texts, read_text_layer, select_pages, split_pdf
+from rate_limiter import get_governor
+from resilience import get_endpoint
+from rule_classifier import classify_with_rules
+from config import (
+    CONTAINER_NAME, DOCUMENT_INTELLIGENCE_MODEL, MAX_TOKENS, TEMPERATURE, SYSTEM_PROMPT,
+    AZURE_LLM_ENDPOINT_KEY, AZURE_LLM_API_KEY_KEY, BATCH_MAX_WORKERS,
+    HTTP_CONNECTION_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, MISTRAL_GZIP_REQUESTS, RULE_CLASSIFIER_ENABLED,
+    LLM_STREAMING, PAGE_SELECTION_ENABLED, TEXT_LAYER_ENABLED,
+    OCR_PREPROCESSING_ENABLED, OCR_SHARDING_ENABLED, OCR_SHARD_MIN_PAGES, OCR_SHARD_PAGES,
+    OCR_SHARD_CONCURRENCY, OCR_SHARD_RATE_PER_SECOND, OCR_POLLING_ADAPTIVE, ROUTER_MODEL_NAME,
+    LLM_HEDGING_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGE_TARGETS
+)
+
+# --- BACKGROUND EVENT LOOP ---
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """Returns the process-wide pipeline event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-pipeline", daemon=True).start()
+        return _loop
+
+
+def submit(coro):
+    """Schedules a coroutine on the pipeline loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_sync(coro):
+    """Runs a coroutine on the pipeline loop and blocks the calling thread until it finishes."""
+    return submit(coro).result()
+
+
+class AsyncRateLimiter:
+    """Spaces out calls on the event loop so that at most rate_per_second of them start each second."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = max(0.0, self._next_start - now)
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls: the first caller for a key starts the call and later
+    callers await the same task. Keys are forgotten once the call finishes; results are not kept.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coro_factory):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key) if self._tasks.get(key) is task else None)
+        # Shielded, so one caller giving up (e.g. a router timeout) does not cancel the call for the others
+        return await asyncio.shield(task)
+
+
+# --- PIPELINE ---
+
+class AsyncPipeline:
+    """
+    Upload, OCR and classification over the async Azure SDK clients.
+    Clients are created lazily on the pipeline loop and kept for the life of the process.
+    - max_concurrency: Number of documents processed at once by process().
+    """
+
+    def __init__(self, connection_string, di_endpoint, di_key, llm_endpoint, llm_api_key,
+                 max_concurrency=BATCH_MAX_WORKERS):
+        self.connection_string = connection_string
+        self.di_endpoint = di_endpoint
+        self.di_key = di_key
+        self.llm_endpoint = llm_endpoint
+        self.llm_api_key = llm_api_key
+        self.max_concurrency = max_concurrency
+        self._clients = {}
+        self._semaphore = None
+        self._shard_semaphore = None
+        self._shard_rate_limiter = None
+        self._single_flight = SingleFlight()
+
+    def _client(self, name, factory):
+        if name not in self._clients:
+            self._clients[name] = factory()
+        return self._clients[name]
+
+    def _transport(self):
+        """
+        Builds an Azure transport over the pipeline's shared aiohttp session, whose connector is sized
+        by HTTP_POOL_CONNECTIONS and HTTP_POOL_MAXSIZE; the session outlives any single client.
+        Must be called on the pipeline loop, which the session is bound to.
+        """
+        session = self._client("aiohttp_session", lambda: aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE, limit_per_host=HTTP_POOL_MAXSIZE
+            )
+        ))
+        return AioHttpTransport(
+            session=session,
+            session_owner=False,
+            connection_timeout=HTTP_CONNECTION_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT
+        )
+
+    def _blob_service(self):
+        return self._client("blob", lambda: BlobServiceClient.from_connection_string(
+            self.connection_string, transport=self._transport(), retry_total=0
+        ))
+
+    def _document_intelligence(self):
+        return self._client("document_intelligence", lambda: DocumentIntelligenceClient(
+            endpoint=self.di_endpoint, credential=AzureKeyCredential(self.di_key),
+            transport=self._transport(), retry_total=0
+        ))
+
+    def _chat_completions(self):
+        self._require_llm_secrets()
+        return self._client("chat_completions", lambda: ChatCompletionsClient(
+            endpoint=self.llm_endpoint, credential=AzureKeyCredential(self.llm_api_key),
+            transport=self._transport(), retry_total=0
+        ))
+
+    def _mistral_http(self):
+        """Keep-alive HTTP/2 httpx client for the Azure ML endpoint."""
+        return self._client("mistral_http", lambda: httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECTION_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE)
+        ))
+
+    def _require_llm_secrets(self):
+        if not self.llm_endpoint or not self.llm_api_key:
+            raise KeyError(f"Missing {AZURE_LLM_ENDPOINT_KEY} or {AZURE_LLM_API_KEY_KEY}")
+
+    async def upload(self, file_data, blob_name):
+        """Uploads bytes to a blob in the app container."""
+        blob_client = self._blob_service().get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+        await get_endpoint("blob").call_async(lambda: blob_client.upload_blob(file_data, overwrite=True))
+
+    async def extract_text(self, file_binary, stats=None):
+        """
+        OCRs a document with the Document Intelligence read model, using the OCR result cache.
+        PDF pages with a usable text layer are read locally, and only scanned pages are sent to OCR.
+        When many pages need OCR, the candidate pages among them are analysed first, and the rest
+        only when the text known by then is not enough to classify on; large page sets are split
+        into page shards OCR'd concurrently.
+        Anything sent to OCR is pre-processed first. Pass a dict as stats to receive the bytes saved
+        and the poll count and wait time of the OCR operations; it is updated while OCR runs.
+        Concurrent calls for the same file share one OCR run; only the first caller's stats are updated.
+        """
+        stats = {} if stats is None else stats
+        cache_key = ocr_cache_key(file_binary, mode="selective" if PAGE_SELECTION_ENABLED else "full")
+        # The cache reads and writes JSON files on disk, so keep it off the shared event loop
+        cached_content = await asyncio.to_thread(ocr_cache.get, cache_key)
+        if cached_content is not None:
+            return cached_content
+        return await self._single_flight.do(
+            ("ocr", cache_key), lambda: self._extract_text_uncached(file_binary, cache_key, stats)
+        )
+
+    async def _extract_text_uncached(self, file_binary, cache_key, stats):
+        # PyMuPDF parsing is CPU-bound, so keep it off the event loop
+        page_texts = None
+        if TEXT_LAYER_ENABLED or PAGE_SELECTION_ENABLED:
+            page_texts = await asyncio.to_thread(read_text_layer, file_binary)
+        scanned_pages = [number for number, text in enumerate(page_texts or [], start=1) if text is None]
+
+        content = None
+        if TEXT_LAYER_ENABLED and page_texts and not scanned_pages:
+            # Born-digital PDF: the local text layer is enough, skip Azure OCR entirely
+            content = merge_page_texts(page_texts)
+        else:
+            ocr_binary = file_binary
+            if OCR_PREPROCESSING_ENABLED:
+                ocr_binary, preprocess_stats = await asyncio.to_thread(preprocess_for_ocr, file_binary)
+                stats.update(preprocess_stats)
+
+            if page_texts:
+                # Text of each page read locally, or None where the page still needs OCR; merged in page order
+                texts = list(page_texts) if TEXT_LAYER_ENABLED else [None] * len(page_texts)
+                ocr_needed = [number for number, text in enumerate(texts, start=1) if text is None]
+
+                async def read_pages(page_numbers):
+                    for number, text in (await self._ocr_pages(ocr_binary, page_numbers, stats)).items():
+                        texts[number - 1] = text
+
+                if PAGE_SELECTION_ENABLED:
+                    selection = select_pages(page_texts, ocr_needed)
+                    if selection.page_numbers:
+                        await read_pages(selection.page_numbers)
+                        # Not enough to classify on: OCR the pages left out, not the pages already read
+                        ocr_needed = [] if selection.is_confident(merge_page_texts(texts)) else selection.remaining_pages()
+                if ocr_needed:
+                    await read_pages(ocr_needed)
+                content = merge_page_texts(texts)
+            else:
+                content = await self._analyze(ocr_binary, stats=stats)
+
+        if content is not None:
+            await asyncio.to_thread(ocr_cache.set, cache_key, content)
+        return content
+
+    async def _analyze(self, file_binary, pages=None, page_count=None, stats=None):
+        """Runs the read model over the document, or only the given pages string (e.g. '1-3,7')."""
+        return (await self._analyze_result(file_binary, pages, page_count, stats)).content
+
+    async def _analyze_pages(self, file_binary, pages, page_count, stats):
+        """Runs the read model over the given pages string (None for all pages) and returns {page number: page text}."""
+        result = await self._analyze_result(file_binary, pages, page_count, stats)
+        return {
+            page.page_number: "".join(result.content[span.offset:span.offset + span.length] for span in page.spans)
+            for page in result.pages or []
+        }
+
+    async def _ocr_pages(self, file_binary, page_numbers, stats):
+        """OCRs the given 1-based pages and returns {page number: page text}, in concurrent shards when there are many."""
+        page_numbers = list(page_numbers)
+        if OCR_SHARDING_ENABLED and len(page_numbers) >= OCR_SHARD_MIN_PAGES:
+            return await self._analyze_sharded(file_binary, page_numbers, stats)
+        return await self._analyze_pages(file_binary, format_page_ranges(page_numbers), len(page_numbers), stats)
+
+    async def _analyze_sharded(self, file_binary, page_numbers, stats):
+        """
+        OCRs the given pages of a PDF as concurrent shards of OCR_SHARD_PAGES pages and returns {page number: page text}.
+        Shard requests share a process-wide concurrency limit and are started no faster than OCR_SHARD_RATE_PER_SECOND.
+        If one shard fails, the others are cancelled.
+        """
+        if self._shard_semaphore is None:
+            self._shard_semaphore = asyncio.Semaphore(OCR_SHARD_CONCURRENCY)
+            self._shard_rate_limiter = AsyncRateLimiter(OCR_SHARD_RATE_PER_SECOND)
+
+        async def analyze_shard(shard_binary, shard_pages):
+            async with self._shard_semaphore:
+                await self._shard_rate_limiter.wait()
+                texts = await self._analyze_pages(shard_binary, None, len(shard_pages), stats)
+            # Shard pages are numbered from 1; map them back to the document's page numbers
+            return {number: texts.get(index) for index, number in enumerate(shard_pages, start=1)}
+
+        page_numbers = sorted(set(page_numbers))
+        shards = await asyncio.to_thread(split_pdf, file_binary, OCR_SHARD_PAGES, page_numbers)
+        tasks = [
+            asyncio.ensure_future(analyze_shard(shard, page_numbers[index * OCR_SHARD_PAGES:(index + 1) * OCR_SHARD_PAGES]))
+            for index, shard in enumerate(shards)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other shards running when one fails
+            for task in tasks:
+                task.cancel()
+            raise
+        return {number: text for result in results for number, text in result.items()}
+
+    async def _analyze_result(self, file_binary, pages=None, page_count=None, stats=None):
+        async def analyze():
+            # A fresh polling method per attempt, so a retry starts again from the first delay
+            polling = True
+            if OCR_POLLING_ADAPTIVE:
+                polling = AdaptivePolling(
+                    page_count=page_count, stats=stats,
+                    path_format_arguments={"endpoint": self.di_endpoint.rstrip("/")}
+                )
+            poller = await self._document_intelligence().begin_analyze_document(
+                DOCUMENT_INTELLIGENCE_MODEL, AnalyzeDocumentRequest(bytes_source=file_binary), pages=pages, polling=polling
+            )
+            return await poller.result()
+
+        return await get_endpoint("document_intelligence").call_async(analyze)
+
+    async def classify(self, text_content, model_name):
+        """
+        Classifies document text with the given model, using the LLM result cache.
+        Long documents are fitted to the prompt token budget; the result's prompt_stats reports the token counts used.
+        Concurrent calls with the same prompt and model share one request.
+        Raises on transport errors and ModelResponseError on unusable answers.
+        """
+        document_text, prompt_stats = budget_document_text(text_content)
+        user_prompt = build_user_prompt(document_text)
+        prompt_stats["prompt_tokens"] = estimate_tokens(f"{SYSTEM_PROMPT}\n{user_prompt}")
+        cache_key = llm_cache_key(model_name, f"{SYSTEM_PROMPT}\n{user_prompt}", MAX_TOKENS)
+        result = llm_result_cache.get(cache_key)
+        if result is None:
+            result = await self._single_flight.do(
+                ("llm", cache_key), lambda: self._classify_uncached(user_prompt, model_name, prompt_stats, cache_key)
+            )
+        # Every caller gets its own copy, so the router can annotate it
+        return copy.deepcopy(result)
+
+    async def _classify_uncached(self, user_prompt, model_name, prompt_stats, cache_key):
+        # Reserve quota for the prompt plus the longest possible answer
+        tokens = prompt_stats["prompt_tokens"] + MAX_TOKENS
+        if LLM_HEDGING_ENABLED:
+            result = await self._hedged_request(user_prompt, model_name, tokens)
+        else:
+            result = await self._resilient_request(user_prompt, model_name, tokens)
+
+        if isinstance(result, dict):
+            result["prompt_stats"] = prompt_stats
+        llm_result_cache.set(cache_key, result)
+        return result
+
+    async def route(self, text_content, model_name=ROUTER_MODEL_NAME):
+        """
+        Classifies with the model router across ROUTER_MODELS, or with model_name alone when it
+        names a specific model. Routed results carry the answering "model" and the "routing" attempts.
+        """
+        if model_name != ROUTER_MODEL_NAME:
+            return await self.classify(text_content, model_name)
+        return await ModelRouter(self.classify).classify(text_content)
+
+    async def _resilient_request(self, user_prompt, model_name, tokens):
+        started = time.monotonic()
+        result = await get_endpoint(f"llm:{model_name}").call_async(
+            lambda: self._request_classification(user_prompt, model_name, tokens)
+        )
+        # Recorded per request and model, so a hedge's latency is not booked to the primary; cache hits
+        # and cancelled requests are left out so the percentiles reflect the deployment itself
+        latency_tracker.record(model_name, time.monotonic() - started)
+        return result
+
+    async def _hedged_request(self, user_prompt, model_name, tokens):
+        """
+        Sends the request and, if it is still running at the model's LLM_HEDGE_PERCENTILE latency,
+        a duplicate to its hedge target; the first valid answer wins and the other is cancelled.
+        """
+        hedge_model = LLM_HEDGE_TARGETS.get(model_name, model_name)
+        delay = latency_tracker.percentile(model_name, LLM_HEDGE_PERCENTILE) or LLM_HEDGE_DEFAULT_DELAY
+        result, winner = await first_success(
+            lambda: self._resilient_request(user_prompt, model_name, tokens),
+            lambda: self._resilient_request(user_prompt, hedge_model, tokens),
+            delay
+        )
+        if winner == "hedge" and hedge_model != model_name and isinstance(result, dict):
+            # Attribute the answer to the deployment that gave it
+            result["model"] = hedge_model
+        return result
+
+    async def _request_classification(self, user_prompt, model_name, tokens):
+        """Waits for the model's rate quota, then sends one classification request and parses the answer."""
+        await get_governor().acquire(model_name, tokens)
+        # This assumes the mistral model name contains "mistral"
+        if "mistral" in model_name:
+            return parse_model_response(await self._complete_mistral(user_prompt))
+        if LLM_STREAMING:
+            return await self._complete_streaming(user_prompt, model_name)
+        response = await self._chat_completions().complete(
+            messages=[SystemMessage(content=SYSTEM_PROMPT), UserMessage(content=user_prompt)],
+            model=model_name,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+        )
+        return parse_model_response(response.choices[0].message.content)
+
+    async def _complete_streaming(self, user_prompt, model_name):
+        """
+        Streams the completion and returns as soon as the top-level JSON object closes.
+        Closing the stream early cancels the rest of the generation, so trailing chatter is never paid for.
+        """
+        response = await self._chat_completions().complete(
+            messages=[SystemMessage(content=SYSTEM_PROMPT), UserMessage(content=user_prompt)],
+            model=model_name,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            stream=True,
+        )
+        scanner = JsonObjectScanner()
+        try:
+            async for update in response:
+                if not update.choices:
+                    continue
+                candidate = scanner.feed(update.choices[0].delta.content or "")
+                if candidate is not None:
+                    try:
+                        return json.loads(candidate)
+                    except ValueError:
+                        # Not valid JSON after all; read the rest and parse the whole answer below
+                        continue
+        finally:
+            await response.aclose()
+        return parse_model_response(scanner.text)
+
+    async def _complete_mistral(self, user_prompt):
+        """
+        Posts to the Azure ML endpoint over a pooled keep-alive HTTP/2 connection on the pipeline loop.
+        httpx asks for and transparently decompresses gzip responses.
+        """
+        self._require_llm_secrets()
+        body = json.dumps(build_mistral_payload(user_prompt)).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Authorization": "Bearer " + self.llm_api_key}
+        if MISTRAL_GZIP_REQUESTS:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        response = await self._mistral_http().post(self.llm_endpoint, content=body, headers=headers)
+        response.raise_for_status()
+        # The response is a JSON list with the model's output as the first element
+        return response.json()[0]
+
+    async def classify_text(self, text_content, model_name):
+        """
+        Classifies OCR'd text with the keyword rules or, if they are not decisive, the given model
+        (ROUTER_MODEL_NAME to use the model router).
+        Never raises: failures are reported as {"class": "Error"} results.
+        """
+        if not text_content:
+            return {"class": "Error", "reason": "No text content provided"}
+        if RULE_CLASSIFIER_ENABLED:
+            rule_result = classify_with_rules(text_content)
+            if rule_result:
+                return rule_result
+        try:
+            return await self.route(text_content, model_name)
+        except Exception as e:
+            return {"class": "Error", "reason": getattr(e, "reason", str(e))}
+
+    async def analyze(self, file_binary, model_name, stats=None):
+        """
+        OCRs and classifies one document that has already been uploaded.
+        Returns {"text_content", "model_result"}; OCR failures are raised, classification failures
+        are reported as {"class": "Error"} results.
+        """
+        text_content = await self.extract_text(file_binary, stats)
+        return {"text_content": text_content, "model_result": await self.classify_text(text_content, model_name)}
+
+    async def process(self, file_binary, filename, model_name):
+        """
+        Uploads and OCRs one document concurrently, then classifies it with classify_text().
+        Never raises: failures are reported as {"class": "Error"} results and an upload_error.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        ocr_stats = {}
+        async with self._semaphore:
+            upload_outcome, text_outcome = await asyncio.gather(
+                self.upload(file_binary, filename), self.extract_text(file_binary, ocr_stats), return_exceptions=True
+            )
+            outcome = {
+                "filename": filename,
+                "ocr_stats": ocr_stats,
+                "upload_error": str(upload_outcome) if isinstance(upload_outcome, Exception) else None,
+                "text_content": None
+            }
+            if isinstance(text_outcome, Exception):
+                outcome["model_result"] = {"class": "Error", "reason": str(text_outcome)}
+                return outcome
+
+            outcome["text_content"] = text_outcome
+            outcome["model_result"] = await self.classify_text(text_outcome, model_name)
+            return outcome
+
+
+_pipelines = {}
+
+
+def get_pipeline(connection_string, di_endpoint, di_key, llm_endpoint, llm_api_key):
+    """Returns the shared AsyncPipeline for the given credentials."""
+    key = (connection_string, di_endpoint, di_key, llm_endpoint, llm_api_key)
+    with _loop_lock:
+        if key not in _pipelines:
+            _pipelines[key] = AsyncPipeline(*key)
+        return _pipelines[key]
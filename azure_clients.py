@@ -0,0 +1,62 @@
+"""
+Shared synchronous Azure client registry for Document Assignment & Labelling application.
+Clients are created once per process and reused across Streamlit sessions and reruns,
+so every call shares the same keep-alive HTTP connection pool.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient
+
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CONNECTION_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_http_session():
+    """Returns the process-wide requests session with a pooled HTTPS adapter."""
+    return _get_or_create(("session",), _create_http_session)
+
+
+def _create_http_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _transport():
+    """Builds an Azure transport over the shared session; the session outlives any single client."""
+    return RequestsTransport(
+        session=get_http_session(),
+        session_owner=False,
+        connection_timeout=HTTP_CONNECTION_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT
+    )
+
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
+def get_blob_service_client(connection_string):
+    """Returns the shared BlobServiceClient for the given connection string."""
+    return _get_or_create(
+        ("blob", connection_string),
+        # Retries are handled by the resilience layer, not the SDK
+        lambda: BlobServiceClient.from_connection_string(connection_string, transport=_transport(), retry_total=0)
+    )
+
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the feedback submit step in the single-document flow.
+Drives streamlit_app.py with Streamlit's AppTest: a classified document is on screen, "Submit
+Feedback" is clicked, and the time until the app has rerun, ready for the next document, is
+measured. The "before" variant restores the previous handler's time.sleep(4) ahead of st.rerun().
+Feedback goes to a feedback sink in a temporary directory whose uploads are kept in memory, so no
+Azure account is needed.
+
+Usage:
+    python benchmark_feedback.py [--documents 3] [--operator-seconds 3]
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import time
+from unittest import mock
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import feedback_sink
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# A classification as the job leaves it in session state once it has finished
+MODEL_RESULT = {
+    "class": "Judgment", "confidence": 0.95, "reason": "Benchmark document",
+    "doc_type": "Court", "sub_type": "Judgement", "description": "Judgment for Claimant"
+}
+
+
+@contextlib.contextmanager
+def app_environment(sink, sleep_before_rerun):
+    """Patches the app's feedback sink and, for the before variant, puts the 4 second sleep back in front of st.rerun()."""
+    rerun = st.rerun
+
+    def rerun_after_sleep(*args, **kwargs):
+        time.sleep(4)
+        rerun(*args, **kwargs)
+
+    with mock.patch.object(feedback_sink, "get_feedback_sink", lambda connection_string: sink), \
+            mock.patch.object(st, "rerun", rerun_after_sleep if sleep_before_rerun else rerun), \
+            mock.patch.object(st, "set_option", lambda *args, **kwargs: None):
+        # set_option is patched because the app sets server.enableCORS when run as __main__,
+        # which only a real server allows
+        yield
+
+
+def submit_seconds(documents):
+    """Average seconds from clicking Submit Feedback to the app being ready for the next document."""
+    timings = []
+    for _ in range(documents):
+        app = AppTest.from_file(APP_PATH, default_timeout=30)
+        app.session_state["classification_complete"] = True
+        app.session_state["model_a_result"] = dict(MODEL_RESULT)
+        app.session_state["filename"] = "benchmark.pdf"
+        app.run()
+        submit = next(button for button in app.button if button.label == "Submit Feedback")
+
+        started = time.perf_counter()
+        submit.click().run()
+        timings.append(time.perf_counter() - started)
+
+        if app.exception:
+            raise RuntimeError(f"The app raised: {app.exception[0].value}")
+        if app.session_state["document_number"] != 1:
+            raise RuntimeError("The submit did not move on to the next document")
+    return sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=3, help="Feedback submits to time per variant")
+    parser.add_argument("--operator-seconds", type=float, default=3.0,
+                        help="Operator time per document outside the submit step (review, clicks)")
+    args = parser.parse_args()
+
+    # AppTest touches st.session_state from the main thread, which Streamlit warns about in bare mode
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as wal_dir:
+        batches = []
+        sink = feedback_sink.FeedbackSink(wal_dir, write_batch=batches.append)
+        print(f"{'Variant':<16}{'Submit (s)':>12}{'Docs/min cap':>14}{'Docs/min':>10}")
+        for name, sleep_before_rerun in (("before (sleep)", True), ("after", False)):
+            with app_environment(sink, sleep_before_rerun):
+                seconds = submit_seconds(args.documents)
+            print(f"{name:<16}{seconds:>12.2f}{60 / seconds:>14.1f}{60 / (seconds + args.operator_seconds):>10.1f}")
+        sink.flush()
+        records = sum(batch.count(b"\n") for batch in batches)
+        print(f"\n{records} feedback records written through the sink.")
+
+
+if __name__ == "__main__":
+    main()
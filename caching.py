@@ -0,0 +1,174 @@
+"""
+Caching helpers for Document Assignment & Labelling application.
+Provides content hashing, a thread-safe in-process LRU cache and a size-bounded on-disk cache.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    DOCUMENT_INTELLIGENCE_MODEL, OCR_CACHE_MEMORY_ITEMS, OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES,
+    LLM_CACHE_MAX_ITEMS, LLM_CACHE_TTL_SECONDS
+)
+
+
+def content_hash(data) -> str:
+    """Returns the SHA-256 hex digest of the given bytes (or str, encoded as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded, least-recently-used in-memory cache.
+    - max_items: Number of entries kept before the least recently used is evicted.
+    - ttl: Optional lifetime of an entry in seconds; expired entries are treated as misses.
+    """
+
+    def __init__(self, max_items, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            expires_at, value = self._items[key]
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskCache:
+    """
+    A persistent JSON cache stored as one file per key in a directory.
+    - directory: Where entries are stored (created on first write).
+    - max_bytes: Total size budget; the least recently used entries are evicted past it.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            # Touch the entry so eviction order follows last use, not creation time
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return default
+
+    def set(self, key, value):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file and rename so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError:
+            # The disk tier is best-effort; the in-memory tier still serves this process
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+class TieredCache:
+    """Looks up an in-memory LRU tier first, then a disk tier, promoting disk hits to memory."""
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+            return value
+        return default
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+
+# --- OCR RESULT CACHE ---
+
+ocr_cache = TieredCache(
+    LRUCache(OCR_CACHE_MEMORY_ITEMS),
+    DiskCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES)
+)
+
+
+def ocr_cache_key(file_binary, model_id=DOCUMENT_INTELLIGENCE_MODEL, mode="full") -> str:
+    """
+    Builds the OCR cache key from the file content, the Document Intelligence model and the extraction
+    mode ("full", or "selective" when only some pages may have been read), so selective text is never
+    served where the full text is expected.
+    """
+    return content_hash(f"{content_hash(file_binary)}{model_id}:{mode}")
+
+
+# --- LLM CLASSIFICATION RESULT CACHE ---
+# Safe because TEMPERATURE is 0.0: identical prompts to the same model give the same answer
+
+llm_result_cache = LRUCache(LLM_CACHE_MAX_ITEMS, ttl=LLM_CACHE_TTL_SECONDS)
+
+
+def llm_cache_key(model_name, prompt, max_tokens) -> str:
+    """Builds the classification cache key from the model, the fully rendered prompt and the token limit."""
+    return f"{model_name}:{max_tokens}:{content_hash(prompt)}"
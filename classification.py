@@ -0,0 +1,270 @@
+"""
+Classification prompt and response handling for Document Assignment & Labelling application.
+Shared by the Streamlit UI and the async pipeline; nothing here touches Streamlit.
+"""
+
+import json
+import re
+from collections import Counter
+
+from config import (
+    MAX_CHARS, MAX_TOKENS, TEMPERATURE, SYSTEM_PROMPT, CLASSIFICATION_CATEGORIES, SPECIAL_DEFENDANT_NAMES,
+    CHARS_PER_TOKEN, PROMPT_DOCUMENT_TOKEN_BUDGET, PROMPT_HEADER_TOKENS, PROMPT_TAIL_TOKENS,
+    PROMPT_KEYWORD_WINDOW_TOKENS, PROMPT_CONTEXT_TERMS, PROMPT_BOILERPLATE_MIN_REPEATS
+)
+from rule_classifier import keyword_pattern
+
+
+class ModelResponseError(Exception):
+    """Raised when a model answers but the answer cannot be used as a classification."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+# --- PROMPT TOKEN BUDGETING ---
+
+def _decisive_terms():
+    """Category keywords, whose presence decides the class (e.g. 'Claim Form' for a Summons)."""
+    return {keyword for category in CLASSIFICATION_CATEGORIES.values() for keyword in category.get("keywords", [])}
+
+
+def _context_terms():
+    terms = set(PROMPT_CONTEXT_TERMS)
+    for category in CLASSIFICATION_CATEGORIES.values():
+        for key in ("additional_terms", "exclude_keywords"):
+            terms.update(category.get(key, []))
+    for names in SPECIAL_DEFENDANT_NAMES.values():
+        if isinstance(names, list):
+            terms.update(name for name in names if "..." not in name)
+    return terms - _decisive_terms()
+
+
+# Whole-word matching as in the rule classifier, so e.g. 'RTA' does not match inside 'portal'
+_DECISIVE_PATTERN = keyword_pattern(_decisive_terms())
+_CONTEXT_PATTERN = keyword_pattern(_context_terms())
+_PAGE_NUMBER_LINE = re.compile(r'^\s*(page\s*)?\d+(\s*(of|/)\s*\d+)?\s*$', re.IGNORECASE)
+GAP_MARKER = "\n[...]\n"
+
+
+def estimate_tokens(text):
+    """Estimates the token count of text with the CHARS_PER_TOKEN heuristic."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _drop_boilerplate(text_content):
+    """
+    Removes page-number lines, and repeats of lines seen on many pages (running headers and footers).
+    The first occurrence of a repeated line is kept, since a letterhead can identify the sender.
+    """
+    lines = text_content.splitlines()
+    counts = Counter(line.strip() for line in lines if line.strip())
+    seen = set()
+    kept = []
+    for line in lines:
+        key = line.strip()
+        if _PAGE_NUMBER_LINE.match(line):
+            continue
+        if counts[key] >= PROMPT_BOILERPLATE_MIN_REPEATS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _merged_length(spans):
+    total, end = 0, 0
+    for start, stop in sorted(spans):
+        start = max(start, end)
+        if stop > start:
+            total += stop - start
+            end = stop
+    return total
+
+
+def budget_document_text(text_content, budget_tokens=PROMPT_DOCUMENT_TOKEN_BUDGET):
+    """
+    Fits document text into a token budget instead of blindly slicing it.
+    Keeps, in priority order, the header, the tail, windows around category keywords and windows around
+    context terms, and drops boilerplate; omitted stretches are replaced by a gap marker.
+    Text already within budget is returned as is.
+    Returns (text, stats) where stats reports document_tokens, kept_tokens and keyword_windows.
+    """
+    document_tokens = estimate_tokens(text_content)
+    if document_tokens <= budget_tokens:
+        return text_content, {"document_tokens": document_tokens, "kept_tokens": document_tokens, "keyword_windows": 0}
+
+    text = _drop_boilerplate(text_content)
+    budget = budget_tokens * CHARS_PER_TOKEN
+    window = PROMPT_KEYWORD_WINDOW_TOKENS * CHARS_PER_TOKEN
+    spans = [
+        (0, min(len(text), PROMPT_HEADER_TOKENS * CHARS_PER_TOKEN)),
+        (max(0, len(text) - PROMPT_TAIL_TOKENS * CHARS_PER_TOKEN), len(text))
+    ]
+    keyword_windows = 0
+    # Decisive keywords first, wherever they are, so context-term hits early in a long bundle cannot crowd them out
+    matches = list(_DECISIVE_PATTERN.finditer(text)) + list(_CONTEXT_PATTERN.finditer(text))
+    for match in matches:
+        span = (max(0, match.start() - window), min(len(text), match.end() + window))
+        if _merged_length(spans + [span]) > budget:
+            # A later window may overlap spans already kept and still fit
+            continue
+        spans.append(span)
+        keyword_windows += 1
+
+    parts, end = [], 0
+    for start, stop in sorted(spans):
+        if start > end:
+            parts.append(GAP_MARKER)
+        if stop > end:
+            parts.append(text[max(start, end):stop])
+            end = stop
+    if end < len(text):
+        parts.append(GAP_MARKER)
+
+    selected = "".join(parts)
+    return selected, {
+        "document_tokens": document_tokens,
+        "kept_tokens": estimate_tokens(selected),
+        "keyword_windows": keyword_windows
+    }
+
+
+def build_user_prompt(text_content):
+    """Renders the classification prompt for the given (already budgeted) document text, capped at MAX_CHARS."""
+    if len(text_content) > MAX_CHARS:
+        text_content = text_content[:MAX_CHARS]
+
+    return (
+        "Analyze the following text. First, classify it. "
+        "### Categories:\n"
+        "1. **Summons**\n"
+        "   - A court-issued document notifying a party they are being sued.\n"
+        "   - Must contain references to 'Claim Form', 'Claim form', 'sealed Claim Form', or 'Writ' (case-insensitive, even if inside a covering letter).\n"
+        "   - May also include terms such as 'Particulars of Claim', 'Defendant Response Pack', or 'Statement of Truth'.\n\n"
+        "   - Will usually include fields for claimant's and defendant's names and addresses.\n\n"
+        "If the class is 'Summons':\n"
+        "- You MUST extract the defendant's name.\n"
+        "- Use the 'Issued' or 'Submitted' date (if available) as the date of service. Format as DD/MM.\n"
+        "- If the summons is against the Policy Holder then return 'PH' for the defendant's name.\n"
+        "- If there is a section called 'Defendant's Legal Representative' with the name of solicitors then return 'PAN' for the defendant's name.\n"
+        "- If the summons is against Admiral, EUI Ltd, or EUI Limited (including variants such as 'EUI Limited (Company Number:...)'), you MUST return exactly 'EUI' for the defendant's name.\n\n"
+        "If it is not a Summons, the 'Description' field should be null.\n"
+        "2. **Judgment**\n"
+        "   - An official court decision, often titled 'Judgment for Claimant' or 'General Form of Judgment or Order'.\n\n"
+        "3. **Solicitor_TP_S152**\n"
+        "   - Classify as Solicitor_TP_S152 if and ONLY if:\n"
+        "       - The text contains a clear reference to 'Section 152' (e.g., 'Section 152', 'S.152', 's152', 'Section 152 (1) (a)', 'Section 152(1)a').\n"
+        "       - OR the text contains a clear reference to 'Road Traffic Act' (e.g., 'Road Traffic Act', 'RTA', 'Road Traffic Act 1988').\n"
+        "       - The keywords are case-insensitive and can have spaces/punctuation between numbers/letters.\n"
+        "4. **Chaser**\n"
+        "- Only classify as Chaser if the document is a follow-up communication AND does NOT contain any legal or procedural terms that indicate a Summons, Judgment, or Solicitor_TP_S152 document.\n"
+        "- Do NOT classify as Chaser if text contains terms like 'Claim Form', 'Summons', 'Judgment', 'Writ', 'Section 151', 'Section 152', 'Road Traffic Act', or 'RTA 1988'.\n"
+        "- Any follow-up communication or repeated attempt to get a response,\n"
+        "  even if the reason or context is not explicitly stated.\n"
+        "- May reference a previous call, message, or action, OR simply indicate\n"
+        "  continued attempts to contact or follow up (e.g., 'I tried again today, no answer')\n"
+        "- Can include cases where:\n"
+        "   • The user receives claim-related communication but doesn't understand the context or origin.\n"
+        "   • The user seeks clarification of a claim.\n"
+        "   • The user expresses frustration over being contacted by phone and would prefer email communication.\n"
+        "   • The user says they prefer to be contacted via telephone.\n"
+        "   • The user has technical issues with access to documents sent by the claims handler.\n"
+        "5. **Other**\n"
+        "   - The text does not clearly fit any of the categories above.\n"
+        "Return ONLY the JSON object.\n\n"
+        "--- DOCUMENT TEXT BEGIN ---\n"
+        f"{text_content}\n"
+        "--- DOCUMENT TEXT END ---\n\n"
+        "JSON output format:\n"
+        "{\n"
+        '  "class": "<Summons|Judgment|Solicitor_TP_S152|Chaser|Other>",\n'
+        '  "confidence": <float between 0.0 and 1.0>,\n'
+        '  "details": {\n'
+        '    "defendant_name": "<The full name of the defendant (ignore Limited, Ltd, or use \'EUI\' if EUI Ltd / EUI Limited / Admiral, or \'PH\' if a company)>",\n'
+        '    "date_of_service": "<The date in DD/MM format>"\n'
+        "  } OR null\n"
+        "}"
+    )
+
+
+def build_mistral_payload(user_prompt):
+    """Builds the Azure ML request body for the Mistral deployment."""
+    return {
+        "input_data": {
+            "input_string": [
+                {
+                    "role": "user",
+                    "content": f"{SYSTEM_PROMPT}\n{user_prompt}"
+                }
+            ],
+            "parameters": {
+                "max_new_tokens": MAX_TOKENS,
+                "temperature": TEMPERATURE,
+                "return_full_text": False
+            }
+        }
+    }
+
+
+class JsonObjectScanner:
+    """
+    Incrementally finds complete top-level JSON objects in streamed model output.
+    feed() returns the text of an object as soon as its closing brace arrives, so the caller can
+    stop reading the stream; braces inside JSON strings are ignored. The rest of that chunk is
+    not scanned for further objects.
+    """
+
+    def __init__(self):
+        self.text = ""  # Everything fed so far, for error reporting
+        self._object = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """Consumes a chunk of output; returns the first object completed within it, or None."""
+        self.text += chunk
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._object = [char]
+                    self._depth = 1
+                continue
+
+            self._object.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return "".join(self._object)
+        return None
+
+
+def parse_model_response(raw_response_content):
+    """
+    Extracts the classification JSON object from a raw model answer.
+    Raises ModelResponseError if there is no answer or no JSON object in it.
+    """
+    if not raw_response_content:
+        raise ModelResponseError("No response content was generated.", "No response content generated")
+
+    # Find the JSON object within the response, in case the model adds extra text
+    json_match = re.search(r'\{.*\}', raw_response_content, re.DOTALL)
+    if not json_match:
+        raise ModelResponseError(
+            f"No JSON object found in response. Raw: {raw_response_content}", "No JSON object in response"
+        )
+    return json.loads(json_match.group(0))
@@ -29,6 +29,47 @@ DEFAULT_MODEL = "Phi-4-multimodal-instruct"
 MAX_CHARS = 28000
 MAX_TOKENS = 250
 TEMPERATURE = 0.0
+# Prompt token budgeting: long documents are reduced to header, tail and keyword windows
+CHARS_PER_TOKEN = 4  # Heuristic used to estimate token counts
+PROMPT_DOCUMENT_TOKEN_BUDGET = 3000  # Tokens of document text sent to the LLM
+PROMPT_HEADER_TOKENS = 1000  # Always keep the start of the document (parties, dates, titles)
+PROMPT_TAIL_TOKENS = 250  # Always keep the end of the document (signatures, enclosures)
+PROMPT_KEYWORD_WINDOW_TOKENS = 120  # Context kept either side of each keyword hit
+PROMPT_BOILERPLATE_MIN_REPEATS = 3  # Lines repeated this often are treated as headers/footers
+PROMPT_CONTEXT_TERMS = ["Defendant", "Claimant", "Issued", "Date of service", "Policy Holder", "Legal Representative"]
+# Stream SDK completions and stop reading once the JSON object closes
+LLM_STREAMING = True
+
+# Client-side quota per deployment (match these to the deployments' TPM/RPM quotas in Azure);
+# requests queue once a bucket is empty. Models not listed are not throttled.
+# Each request reserves its estimated prompt tokens plus MAX_TOKENS.
+MODEL_RATE_LIMITS = {
+    "Phi-4-multimodal-instruct": {"tokens_per_minute": 100000, "requests_per_minute": 100},
+    "gpt-4o-mini": {"tokens_per_minute": 200000, "requests_per_minute": 200},
+    "mistralai-mistral-7b-instruc-11": {"tokens_per_minute": 60000, "requests_per_minute": 60}
+}
+# Set to a SQLite file path to share the quota buckets between worker processes on one host
+RATE_LIMIT_STATE_DB = None
+
+# Model routing: classify with the first healthy model in ROUTER_MODELS and escalate along the list only
+# when the answer is invalid JSON or below ROUTER_CONFIDENCE_THRESHOLD. Order from cheapest to most capable.
+MODEL_ROUTING_ENABLED = True
+ROUTER_MODEL_NAME = "auto"  # Model name that selects the router instead of a single model
+ROUTER_MODELS = [AVAILABLE_MODELS["phi4"], AVAILABLE_MODELS["gpt4o_mini"]]  # Mistral needs its own Azure ML endpoint
+ROUTER_CONFIDENCE_THRESHOLD = 0.7
+ROUTER_ATTEMPT_TIMEOUT = 30  # Seconds before failing over to the next model
+ROUTER_SLOW_P95_SECONDS = 10  # Models slower than this at p95 are tried after faster ones
+ROUTER_LATENCY_WINDOW = 200  # Latest calls per model kept for the latency percentiles
+ROUTER_MIN_SAMPLES = 5  # Calls needed before a model's percentiles are used
+
+# Hedged LLM requests (opt-in): if an answer takes longer than the model's LLM_HEDGE_PERCENTILE latency, send a
+# duplicate to LLM_HEDGE_TARGETS[model] (default: the same deployment), keep the first valid answer and cancel the other
+LLM_HEDGING_ENABLED = False
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_DEFAULT_DELAY = 8.0  # Seconds; used until the model has ROUTER_MIN_SAMPLES latency samples
+LLM_HEDGE_TARGETS = {}  # e.g. {"Phi-4-multimodal-instruct": "gpt-4o-mini"}
+LLM_HEDGE_MAX_RATE = 0.1  # At most this share of the latest LLM_HEDGE_WINDOW requests is hedged
+LLM_HEDGE_WINDOW = 200
 
 # --- DOCUMENT CLASSIFICATION CONFIGURATION ---
 # Document types
@@ -88,6 +129,16 @@ CLASSIFICATION_CATEGORIES = {
     }
 }
 
+# --- RULE-BASED PRE-CLASSIFIER ---
+# Categories the keyword rules may decide without calling the LLM, mapped to the LLM class label.
+# A rule only fires when no other category's keywords appear in the document.
+RULE_DECISIVE_CATEGORIES = {
+    "JUDGMENT": "Judgment",
+    "SOLICITOR_TP_S152": "Solicitor_TP_S152"
+}
+RULE_CLASSIFIER_ENABLED = True
+RULE_CLASSIFIER_NAME = "rule-classifier"  # Logged as the model name in feedback
+
 # --- SPECIAL DEFENDANT NAMES ---
 SPECIAL_DEFENDANT_NAMES = {
     "PH": "Policy Holder",
@@ -100,16 +151,113 @@ SPECIAL_DEFENDANT_NAMES = {
 SUPPORTED_FILE_TYPES = ["pdf", "image"]
 MAX_DESCRIPTION_CHARS = 200
 
+# Previews: first-page thumbnails are cached by content hash and render settings
+PREVIEW_PDF_DPI = 96  # Render resolution for the first page of a PDF
+PREVIEW_FORMAT = "png"  # "png" or "webp"
+PREVIEW_CACHE_MAX_ITEMS = 64
+PREVIEW_IMAGE_MAX_PIXELS = 1_500_000  # Uploaded images are previewed at no more than this many pixels
+PREVIEW_IMAGE_QUALITY = 80  # JPEG/WebP quality of previews
+
+# Batch mode: number of documents uploaded, OCR'd and classified concurrently
+BATCH_MAX_WORKERS = 4
+
+# Background classification jobs, keyed by document hash and model, survive Streamlit reruns and reconnects
+JOB_STORE_MAX_ITEMS = 256
+JOB_RESULT_TTL_SECONDS = 60 * 60  # Finished jobs are reused for this long before the work is redone; errors are not reused
+
 # Feedback status codes
 FEEDBACK_STATUS = {
     "SUCCESS": "S",
     "FAILURE": "F"
 }
 
+# Feedback records are logged locally and shipped to Blob Storage in batches
+FEEDBACK_WAL_DIR = ".cache/feedback"  # Write-ahead log; keep on persistent disk so records survive restarts
+FEEDBACK_FLUSH_RECORDS = 100  # Ship once this many records are pending...
+FEEDBACK_FLUSH_SECONDS = 30  # ...or at least this often
+FEEDBACK_SINK_MODE = "append"  # "append": one append blob per day; "files": one JSONL blob per batch
+FEEDBACK_BLOB_PREFIX = "feedback/"
+# Offline analytics (feedback_analytics.py): cached columnar table and parallel blob listing
+FEEDBACK_ANALYTICS_CACHE = ".cache/feedback_analytics.json.gz"
+FEEDBACK_ANALYTICS_WORKERS = 8  # Name prefixes listed at once
+FEEDBACK_ANALYTICS_FIRST_YEAR = 2024  # First year listed when there is no cached table
+
 # --- API ENDPOINTS ---
 # Document Intelligence model
 DOCUMENT_INTELLIGENCE_MODEL = "prebuilt-read"
 
+# Page-selective OCR: when more than PAGE_SELECTION_MIN_PAGES pages of a PDF need OCR, only the first of them,
+# the last page and pages whose text layer mentions a classification keyword are sent to Document Intelligence
+PAGE_SELECTION_ENABLED = True
+PAGE_SELECTION_MIN_PAGES = 4
+PAGE_SELECTION_LEADING_PAGES = 3
+# If the known text contains no keyword, OCR the other pages too unless the text layer covered this share of pages
+PAGE_SELECTION_TEXT_LAYER_COVERAGE = 0.9
+
+# Local text-layer extraction: born-digital PDF pages are read with PyMuPDF instead of Azure OCR.
+# A page's text layer is usable if it passes all of these checks; other pages are treated as scanned.
+TEXT_LAYER_ENABLED = True
+TEXT_LAYER_MIN_CHARS = 50  # Non-space characters on the page
+TEXT_LAYER_MIN_DENSITY = 0.2  # Non-space characters per 1000 square points (about 100 on an A4 page)
+TEXT_LAYER_MIN_ALNUM_RATIO = 0.6  # Share of letters and digits; garbled font encodings fall below this
+TEXT_LAYER_MAX_BAD_GLYPH_RATIO = 0.02  # Share of replacement, private-use and control characters
+
+# OCR pre-processing: re-encode image pages as deskewed grayscale at OCR-sufficient DPI and strip
+# unused PDF objects before upload to Document Intelligence
+OCR_PREPROCESSING_ENABLED = True
+OCR_TARGET_DPI = 200
+OCR_MAX_LONG_SIDE = 2400  # Pixels; used for images without a DPI (about 200 DPI on A4)
+OCR_JPEG_QUALITY = 85
+OCR_DESKEW_MAX_ANGLE = 5  # Degrees either way
+OCR_DESKEW_STEP = 0.5  # Degrees
+
+# Sharded OCR: when at least OCR_SHARD_MIN_PAGES pages of a PDF need OCR, they are split into shards
+# analysed concurrently, within a process-wide concurrency and request-rate limit
+OCR_SHARDING_ENABLED = True
+OCR_SHARD_MIN_PAGES = 40
+OCR_SHARD_PAGES = 20
+OCR_SHARD_CONCURRENCY = 4
+OCR_SHARD_RATE_PER_SECOND = 4  # Keep below the Document Intelligence TPS quota (15 on S0)
+
+# Adaptive polling of Document Intelligence operations (a Retry-After from the service always wins)
+OCR_POLLING_ADAPTIVE = True
+OCR_POLL_FIRST_DELAY = 0.5  # Seconds before the first status check of a one-page document
+OCR_POLL_SECONDS_PER_PAGE = 0.1  # Added to the first delay for each further page
+OCR_POLL_INTERVAL = 0.5  # Seconds between later checks, growing by OCR_POLL_BACKOFF each time
+OCR_POLL_BACKOFF = 1.5
+OCR_POLL_MAX_INTERVAL = 5.0
+
+# --- CACHE CONFIGURATION ---
+# OCR results are cached by SHA-256 of the file bytes plus the Document Intelligence model
+OCR_CACHE_MEMORY_ITEMS = 128
+OCR_CACHE_DIR = ".cache/ocr"
+OCR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# LLM classification results are cached by model, rendered prompt and MAX_TOKENS
+LLM_CACHE_MAX_ITEMS = 1024
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# --- HTTP CONNECTION POOL CONFIGURATION ---
+# Shared by the Blob, Document Intelligence and chat completions clients
+HTTP_POOL_CONNECTIONS = 10  # Number of distinct hosts to keep pools for
+HTTP_POOL_MAXSIZE = 20  # Keep-alive connections per host
+HTTP_CONNECTION_TIMEOUT = 10  # Seconds
+HTTP_READ_TIMEOUT = 120  # Seconds
+# Also used by the Mistral endpoint client. Compress request bodies only if the endpoint accepts Content-Encoding: gzip
+MISTRAL_GZIP_REQUESTS = False
+
+# --- RESILIENCE CONFIGURATION ---
+# Retries with jittered exponential backoff (or the service's Retry-After) for LLM, DI and Blob calls
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5  # Seconds; the cap on the first retry's random delay, doubling each attempt
+RETRY_MAX_DELAY = 20.0  # Seconds
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Per-endpoint circuit breaker: pause calls after this many consecutive transient failures
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+# Per-endpoint limit on calls in flight at once
+ENDPOINT_MAX_CONCURRENCY = 8
+
 # --- ERROR MESSAGES ---
 ERROR_MESSAGES = {
     "MISSING_SECRET": "Missing secret: {}. Please add {} and {}.",
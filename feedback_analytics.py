@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline feedback analytics for Document Assignment & Labelling application.
+Loads every feedback record into a local columnar table and reports accuracy and confusion
+matrices per model. Records come from the S___timestamp___model___... blob names written before
+the feedback sink, and from the sink's JSONL batches under FEEDBACK_BLOB_PREFIX.
+
+Blob listing is split into status and month name prefixes that are paged through in parallel.
+The table is cached with a last-modified watermark, so later runs only list the latest months
+and download the batches that changed.
+
+Usage:
+    python feedback_analytics.py [--refresh | --offline] [--field doc_type|sub_type] [--model NAME]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from azure_clients import get_blob_service_client
+from resilience import get_endpoint
+from config import (
+    AZURE_CONNECTION_STRING_KEY, CONTAINER_NAME, FEEDBACK_BLOB_PREFIX, FEEDBACK_ANALYTICS_CACHE,
+    FEEDBACK_ANALYTICS_WORKERS, FEEDBACK_ANALYTICS_FIRST_YEAR
+)
+
+COLUMNS = [
+    "key", "status", "timestamp", "model",
+    "predicted_doc_type", "predicted_sub_type", "predicted_description",
+    "actual_doc_type", "actual_sub_type", "actual_description", "filename"
+]
+
+# Blob names use local time and the watermark is UTC last-modified, so re-list a little before it
+WATERMARK_MARGIN = timedelta(days=1)
+
+
+def parse_blob_name(name):
+    """Returns a row for a S___timestamp___model___... feedback blob name, or None for any other blob."""
+    parts = name.split("___")
+    if len(parts) < 10 or parts[0] not in ("S", "F"):
+        return None
+    row = dict(zip(COLUMNS[1:10], parts[:9]))
+    # The original filename may itself contain the separator
+    filename = "___".join(parts[9:])
+    row["filename"] = filename[:-4] if filename.endswith(".txt") else filename
+    row["key"] = name
+    return row
+
+
+def parse_batch(data):
+    """Returns the rows of a JSONL batch written by the feedback sink, keyed by record id."""
+    rows = []
+    for line in data.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        row = {column: record.get(column) for column in COLUMNS[1:]}
+        row["key"] = record["id"]
+        rows.append(row)
+    return rows
+
+
+class FeedbackTable:
+    """Column-oriented feedback rows plus the watermark of the last refresh, cached as gzipped JSON."""
+
+    def __init__(self, columns=None, watermark=None):
+        self.columns = columns or {column: [] for column in COLUMNS}
+        self.watermark = watermark
+        self._keys = set(self.columns["key"])
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["columns"], data["watermark"])
+        except (OSError, ValueError, KeyError):
+            return cls()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "columns": self.columns}, f)
+        os.replace(tmp_path, path)
+
+    def add(self, row):
+        """Appends a row unless one with the same key is already in the table."""
+        if row["key"] in self._keys:
+            return False
+        self._keys.add(row["key"])
+        for column in COLUMNS:
+            self.columns[column].append(row.get(column))
+        return True
+
+    def __len__(self):
+        return len(self.columns["key"])
+
+
+def month_prefixes(since):
+    """Blob name prefixes per status and yymm month, from since's month (or FEEDBACK_ANALYTICS_FIRST_YEAR) to now."""
+    year, month = (since.year, since.month) if since else (FEEDBACK_ANALYTICS_FIRST_YEAR, 1)
+    now = datetime.now()
+    prefixes = []
+    while (year, month) <= (now.year, now.month):
+        prefixes.extend(f"{status}___{year % 100:02d}{month:02d}" for status in ("S", "F"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return prefixes
+
+
+def refresh(table, container):
+    """Adds the records written since the table's watermark; returns the number of new rows."""
+    since = datetime.fromisoformat(table.watermark) - WATERMARK_MARGIN if table.watermark else None
+
+    def list_prefix(prefix):
+        return get_endpoint("blob").call(lambda: [
+            (blob.name, blob.last_modified)
+            for blob in container.list_blobs(name_starts_with=prefix, results_per_page=5000)
+        ])
+
+    def download(name):
+        return get_endpoint("blob").call(lambda: container.download_blob(name).readall())
+
+    with ThreadPoolExecutor(FEEDBACK_ANALYTICS_WORKERS) as executor:
+        prefixes = month_prefixes(since) + [FEEDBACK_BLOB_PREFIX]
+        listings = dict(zip(prefixes, executor.map(list_prefix, prefixes)))
+        batch_listing = listings.pop(FEEDBACK_BLOB_PREFIX)
+        # Append blobs keep growing, so re-read every batch blob modified since the watermark
+        changed_batches = [name for name, last_modified in batch_listing if since is None or last_modified >= since]
+        batch_rows = list(executor.map(lambda name: parse_batch(download(name)), changed_batches))
+    named_listing = [blob for listing in listings.values() for blob in listing]
+
+    added = 0
+    for name, _ in named_listing:
+        row = parse_blob_name(name)
+        if row:
+            added += table.add(row)
+    for rows in batch_rows:
+        added += sum(table.add(row) for row in rows)
+
+    modified = [last_modified for _, last_modified in named_listing + batch_listing]
+    if modified and (table.watermark is None or max(modified) > datetime.fromisoformat(table.watermark)):
+        table.watermark = max(modified).isoformat()
+    return added
+
+
+# --- METRICS ---
+
+def accuracy_by_model(table):
+    """Returns {model: (correct, total)}; a record is correct when its status is S."""
+    totals = defaultdict(lambda: [0, 0])
+    for model, status in zip(table.columns["model"], table.columns["status"]):
+        totals[model][0] += status == "S"
+        totals[model][1] += 1
+    return {model: tuple(counts) for model, counts in totals.items()}
+
+
+def confusion_matrices(table, field="doc_type"):
+    """Returns {model: Counter({(predicted, actual): count})} for doc_type or sub_type codes."""
+    matrices = defaultdict(Counter)
+    for model, predicted, actual in zip(
+        table.columns["model"], table.columns[f"predicted_{field}"], table.columns[f"actual_{field}"]
+    ):
+        matrices[model][(predicted, actual)] += 1
+    return matrices
+
+
+def format_matrix(matrix):
+    labels = sorted({label for pair in matrix for label in pair}, key=str)
+    width = max([8] + [len(str(label)) + 2 for label in labels])
+    lines = ["predicted \\ actual".ljust(20) + "".join(str(label).rjust(width) for label in labels)]
+    for predicted in labels:
+        lines.append(str(predicted).ljust(20) + "".join(str(matrix[(predicted, actual)]).rjust(width) for actual in labels))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and confusion matrices per model from feedback records.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--refresh", action="store_true", help="Ignore the cache and rebuild the table from scratch")
+    mode.add_argument("--offline", action="store_true", help="Report from the cached table without listing blobs")
+    parser.add_argument("--field", choices=("doc_type", "sub_type"), default="doc_type", help="Confusion matrix field")
+    parser.add_argument("--model", help="Only report this model")
+    parser.add_argument("--cache", default=FEEDBACK_ANALYTICS_CACHE, help="Path of the cached table")
+    parser.add_argument("--connection-string", default=os.getenv(AZURE_CONNECTION_STRING_KEY),
+                        help=f"Storage connection string (default: ${AZURE_CONNECTION_STRING_KEY})")
+    args = parser.parse_args()
+
+    table = FeedbackTable() if args.refresh else FeedbackTable.load(args.cache)
+    if not args.offline:
+        if not args.connection_string:
+            parser.error(f"Set {AZURE_CONNECTION_STRING_KEY} or pass --connection-string")
+        started = time.perf_counter()
+        container = get_blob_service_client(args.connection_string).get_container_client(CONTAINER_NAME)
+        added = refresh(table, container)
+        table.save(args.cache)
+        print(f"Loaded {added} new records in {time.perf_counter() - started:.1f}s; {len(table)} in total.\n")
+
+    started = time.perf_counter()
+    accuracy = accuracy_by_model(table)
+    matrices = confusion_matrices(table, args.field)
+    for model in sorted(accuracy, key=str):
+        if args.model and model != args.model:
+            continue
+        correct, total = accuracy[model]
+        print(f"{model}: {correct}/{total} correct ({correct / total:.1%})")
+        print(format_matrix(matrices[model]))
+        print()
+    print(f"Computed in {time.perf_counter() - started:.2f}s over {len(table)} records.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Buffered feedback sink for Document Assignment & Labelling application.
+Feedback records are appended to a local write-ahead log, one JSON line each, and shipped to Blob
+Storage in batches once FEEDBACK_FLUSH_RECORDS records are pending or every FEEDBACK_FLUSH_SECONDS:
+appended to one append blob per day, or written as one JSONL blob per batch.
+
+Logs left behind by a process that stopped are shipped by the next one on the same host, so
+records survive restarts; files are named after their host and process, so scaled-out instances
+sharing the directory never claim each other's logs. Shipping is at-least-once; every record
+carries an id so readers can drop duplicates.
+"""
+
+import atexit
+import glob
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from azure.storage.blob import BlobType
+
+from azure_clients import get_blob_service_client
+from resilience import get_endpoint
+from config import (
+    CONTAINER_NAME, FEEDBACK_WAL_DIR, FEEDBACK_FLUSH_RECORDS, FEEDBACK_FLUSH_SECONDS, FEEDBACK_SINK_MODE,
+    FEEDBACK_BLOB_PREFIX
+)
+
+
+# wal-<host>@<pid>.jsonl and batch-<host>@<pid>-<sealed ns>.jsonl; host names cannot contain '@'
+_FILE_NAME = re.compile(r'^(wal|batch)-(?P<host>[^@]+)@(?P<pid>\d+)(-\d+)?\.jsonl$')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FeedbackSink:
+    """
+    Write-ahead-logged, batching feedback writer.
+    - directory: Where the log and sealed batches are kept; each process logs to its own file.
+    - write_batch: Callable that stores one batch of JSON lines (bytes) remotely, raising on failure.
+    """
+
+    def __init__(self, directory, write_batch, flush_records=FEEDBACK_FLUSH_RECORDS, flush_seconds=FEEDBACK_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self._write_batch = write_batch
+        self._host = socket.gethostname()
+        self._pid = os.getpid()
+        # The directory may be shared by instances on other hosts, whose PIDs can coincide with ours
+        self._owner = f"{self._host}@{self._pid}"
+        self._wal_path = os.path.join(directory, f"wal-{self._owner}.jsonl")
+        self._pending = 0
+        self._wal_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        threading.Thread(target=self._run, name="feedback-sink", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, record):
+        """Durably logs one record (a JSON-serialisable dict) and returns its id; shipping happens later."""
+        record = {"id": uuid.uuid4().hex, **record}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._wal_lock:
+            with open(self._wal_path, "a", encoding="utf-8") as wal:
+                wal.write(line)
+                wal.flush()
+                os.fsync(wal.fileno())
+            self._pending += 1
+            if self._pending >= self.flush_records:
+                self._wake.set()
+        return record["id"]
+
+    def flush(self):
+        """
+        Seals the current log and ships every batch this process owns.
+        Returns False if a batch could not be shipped; it stays on disk for the next flush.
+        """
+        with self._flush_lock:
+            with self._wal_lock:
+                if os.path.exists(self._wal_path):
+                    self._seal(self._wal_path)
+                self._pending = 0
+            for path in sorted(glob.glob(os.path.join(self.directory, f"batch-{glob.escape(self._owner)}-*.jsonl"))):
+                with open(path, "rb") as batch:
+                    data = batch.read()
+                if data:
+                    try:
+                        self._write_batch(data)
+                    except Exception:
+                        return False
+                os.remove(path)
+            return True
+
+    def _seal(self, path):
+        # Sealed batches are named after the process that ships them and ordered by sealing time
+        os.replace(path, os.path.join(self.directory, f"batch-{self._owner}-{time.time_ns()}.jsonl"))
+
+    def _recover(self):
+        """
+        Claims logs and batches of this host's processes that are no longer running, so this one ships them.
+        Other hosts' files are left alone: their processes cannot be checked from here.
+        """
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            match = _FILE_NAME.match(os.path.basename(path))
+            if not match or match["host"] != self._host:
+                continue
+            pid = int(match["pid"])
+            if pid == self._pid or _process_alive(pid):
+                continue
+            try:
+                self._seal(path)
+            except FileNotFoundError:
+                # Another starting process claimed it first
+                pass
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+
+def blob_batch_writer(connection_string):
+    """Returns a write_batch callable storing batches in the app container as FEEDBACK_SINK_MODE says."""
+    def write_batch(data):
+        now = datetime.now(timezone.utc)
+        service = get_blob_service_client(connection_string)
+        if FEEDBACK_SINK_MODE == "append":
+            # Each batch becomes one block of the day's append blob
+            blob_client = service.get_blob_client(container=CONTAINER_NAME, blob=f"{FEEDBACK_BLOB_PREFIX}{now:%Y/%m/%d}.jsonl")
+            get_endpoint("blob").call(lambda: blob_client.upload_blob(data, blob_type=BlobType.APPENDBLOB))
+        else:
+            blob_name = f"{FEEDBACK_BLOB_PREFIX}{now:%Y/%m/%d/%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl"
+            blob_client = service.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+            get_endpoint("blob").call(lambda: blob_client.upload_blob(data, overwrite=True))
+    return write_batch
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_feedback_sink(connection_string):
+    """Returns the process-wide feedback sink shipping to the given storage account."""
+    with _sinks_lock:
+        if connection_string not in _sinks:
+            _sinks[connection_string] = FeedbackSink(FEEDBACK_WAL_DIR, blob_batch_writer(connection_string))
+        return _sinks[connection_string]
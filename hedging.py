@@ -0,0 +1,69 @@
+"""
+Hedged requests for Document Assignment & Labelling application.
+If a call is still running at a latency-percentile deadline, a duplicate is started and the first
+one to succeed wins; the other is cancelled. A rolling budget caps how many calls are hedged,
+so the extra spend stays bounded.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from config import LLM_HEDGE_MAX_RATE, LLM_HEDGE_WINDOW
+
+
+class HedgeBudget:
+    """Allows a hedge only while hedged calls are under max_rate of the latest window calls."""
+
+    def __init__(self, max_rate=LLM_HEDGE_MAX_RATE, window=LLM_HEDGE_WINDOW):
+        self.max_rate = max_rate
+        self._calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allows(self):
+        with self._lock:
+            return sum(self._calls) < self.max_rate * max(1, len(self._calls))
+
+    def record(self, hedged):
+        with self._lock:
+            self._calls.append(hedged)
+
+    @property
+    def rate(self):
+        """Share of the latest calls that were hedged."""
+        with self._lock:
+            return sum(self._calls) / len(self._calls) if self._calls else 0.0
+
+
+# Process-wide, so the cap holds across sessions
+hedge_budget = HedgeBudget()
+
+
+async def first_success(primary, hedge, delay, budget=hedge_budget):
+    """
+    Awaits primary(); if it has not finished after delay seconds and the budget allows, also
+    starts hedge() and takes whichever finishes first without raising.
+    primary and hedge are zero-argument coroutine functions.
+    Returns (result, winner) with winner "primary" or "hedge"; raises the last error if both fail.
+    """
+    tasks = {asyncio.ensure_future(primary()): "primary"}
+    try:
+        done, _ = await asyncio.wait(set(tasks), timeout=delay)
+        hedged = not done and budget.allows()
+        if hedged:
+            tasks[asyncio.ensure_future(hedge())] = "hedge"
+        budget.record(hedged)
+
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), tasks[task]
+                error = task.exception()
+        raise error
+    finally:
+        # Cancel the loser, or both calls if our caller was cancelled
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,81 @@
+"""
+Background classification jobs for Document Assignment & Labelling application.
+OCR and classification run as jobs on the async pipeline, keyed by document hash and model, and
+are kept in a process-wide store. A Streamlit rerun or browser reconnect looks its job up and polls
+it, so work that is already running or finished is never started again.
+"""
+
+import threading
+import time
+
+from async_pipeline import submit
+from caching import LRUCache, content_hash
+from config import JOB_STORE_MAX_ITEMS, JOB_RESULT_TTL_SECONDS
+
+
+def job_key(file_binary, model_name):
+    """Returns the job key for classifying a document with a model."""
+    return (content_hash(file_binary), model_name)
+
+
+class Job:
+    """
+    One background job.
+    - key: The job key, see job_key().
+    - stats: Dict the job updates while it runs (e.g. OCR poll counts), readable from any thread.
+    - future: concurrent.futures.Future of the job's outcome.
+    """
+
+    def __init__(self, key, stats, future):
+        self.key = key
+        self.stats = stats
+        self.future = future
+        self.started_at = time.time()
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def failed(self):
+        return self.future.done() and self.future.exception() is not None
+
+    @property
+    def errored(self):
+        """True if the job failed or finished with an {"class": "Error"} classification, e.g. after a 429 or timeout."""
+        if not self.future.done():
+            return False
+        if self.future.exception() is not None:
+            return True
+        outcome = self.future.result()
+        return isinstance(outcome, dict) and (outcome.get("model_result") or {}).get("class") == "Error"
+
+
+class JobStore:
+    """Thread-safe store of running and finished jobs, shared by every session of the process."""
+
+    def __init__(self, max_items=JOB_STORE_MAX_ITEMS, ttl=JOB_RESULT_TTL_SECONDS):
+        self._jobs = LRUCache(max_items, ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the job for key, or None if there is none (or it has expired)."""
+        return self._jobs.get(key) if key is not None else None
+
+    def submit(self, key, coro_factory):
+        """
+        Returns the job for key, starting coro_factory(stats) on the pipeline loop only if no job
+        for key is running or finished. Jobs that failed or ended in an Error result are started again.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.errored:
+                return job
+            stats = {}
+            job = Job(key, stats, submit(coro_factory(stats)))
+            self._jobs.set(key, job)
+            return job
+
+
+# Process-wide, so reruns and other sessions find the same jobs
+job_store = JobStore()
@@ -0,0 +1,131 @@
+"""
+Model routing for Document Assignment & Labelling application.
+Classifies with the cheapest healthy model first and escalates to a stronger model only when the
+answer is invalid or not confident enough. Deployments that are down (circuit open) or slow
+(rolling p95 latency over ROUTER_SLOW_P95_SECONDS) are tried last, so routing follows live data.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from classification import ModelResponseError
+from resilience import get_endpoint
+from config import (
+    ROUTER_MODELS, ROUTER_CONFIDENCE_THRESHOLD, ROUTER_ATTEMPT_TIMEOUT, ROUTER_SLOW_P95_SECONDS,
+    ROUTER_LATENCY_WINDOW, ROUTER_MIN_SAMPLES
+)
+
+
+class LatencyTracker:
+    """Rolling window of the latest classification latencies (seconds) per model."""
+
+    def __init__(self, window=ROUTER_LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, seconds):
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model_name, q):
+        """Nearest-rank latency at percentile q (0-100), or None until ROUTER_MIN_SAMPLES calls were seen."""
+        with self._lock:
+            latencies = sorted(self._samples.get(model_name, ()))
+        if len(latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, round(q / 100 * (len(latencies) - 1)))]
+
+    def summary(self):
+        """Returns {model name: {"calls", "p50", "p95"}} over the current windows."""
+        with self._lock:
+            models = list(self._samples)
+        return {
+            model_name: {
+                "calls": len(self._samples[model_name]),
+                "p50": self.percentile(model_name, 50),
+                "p95": self.percentile(model_name, 95)
+            }
+            for model_name in models
+        }
+
+
+# Process-wide, so every session's calls inform routing
+latency_tracker = LatencyTracker()
+
+
+def result_confidence(result):
+    """Returns the model's confidence as a float, or 0.0 when it is missing or not a number."""
+    try:
+        return float(result.get("confidence"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ModelRouter:
+    """
+    Escalating classification over a list of models.
+    - classify: Coroutine function (text_content, model_name) returning a result dict,
+      e.g. AsyncPipeline.classify.
+    - models: Model names ordered from cheapest to most capable.
+    """
+
+    def __init__(self, classify, models=ROUTER_MODELS, tracker=latency_tracker):
+        self._classify = classify
+        self.models = list(models)
+        self.tracker = tracker
+
+    def candidates(self):
+        """Models in the order to try them: healthy, then slow, then down, each group keeping the cost order."""
+        def health(model_name):
+            if get_endpoint(f"llm:{model_name}").breaker.is_open:
+                return 2
+            p95 = self.tracker.percentile(model_name, 95)
+            return 1 if p95 is not None and p95 > ROUTER_SLOW_P95_SECONDS else 0
+        return sorted(self.models, key=health)
+
+    async def classify(self, text_content):
+        """
+        Returns the first result at or above ROUTER_CONFIDENCE_THRESHOLD, else the most confident one.
+        The result's "model" is the model that produced it and "routing" lists every attempt.
+        Raises the last error if no model gave a usable answer.
+        """
+        attempts = []
+        best, best_confidence, last_error = None, -1.0, None
+        for model_name in self.candidates():
+            try:
+                result = await asyncio.wait_for(self._classify(text_content, model_name), ROUTER_ATTEMPT_TIMEOUT)
+                if not isinstance(result, dict):
+                    raise ModelResponseError(f"Unexpected response: {result!r}", "Response is not a JSON object")
+            except KeyError:
+                # Missing secrets affect every model alike
+                raise
+            except asyncio.TimeoutError:
+                # A lower bound on the real latency, but enough to mark the deployment as slow
+                self.tracker.record(model_name, ROUTER_ATTEMPT_TIMEOUT)
+                attempts.append({"model": model_name, "outcome": "timeout"})
+                last_error = TimeoutError(f"{model_name} did not answer within {ROUTER_ATTEMPT_TIMEOUT}s")
+                continue
+            except (ModelResponseError, ValueError) as error:
+                attempts.append({"model": model_name, "outcome": "invalid"})
+                last_error = error
+                continue
+            except Exception as error:
+                attempts.append({"model": model_name, "outcome": "failed"})
+                last_error = error
+                continue
+
+            confidence = result_confidence(result)
+            attempts.append({"model": model_name, "outcome": "ok", "confidence": confidence})
+            # A hedged request may already have been answered by an alternate deployment
+            result.setdefault("model", model_name)
+            if confidence > best_confidence:
+                best, best_confidence = result, confidence
+            if confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+                break
+
+        if best is None:
+            raise last_error
+        best["routing"] = attempts
+        return best
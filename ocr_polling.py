@@ -0,0 +1,53 @@
+"""
+Adaptive polling for Document Intelligence long-running operations.
+Replaces the SDK's fixed polling cadence with a fast first poll sized to the page count and a
+backoff after it, while still honouring any Retry-After the service sends. Poll counts and
+total wait are recorded per document.
+"""
+
+from azure.core.polling.async_base_polling import AsyncLROBasePolling
+
+from config import (
+    OCR_POLL_FIRST_DELAY, OCR_POLL_SECONDS_PER_PAGE, OCR_POLL_INTERVAL, OCR_POLL_BACKOFF, OCR_POLL_MAX_INTERVAL
+)
+
+
+class AdaptivePolling(AsyncLROBasePolling):
+    """
+    Async polling method with an adaptive delay between status checks.
+    - page_count: Pages being analysed; the first status check waits longer for bigger jobs.
+    - stats: Optional dict that receives running ocr_polls and ocr_poll_wait (seconds) totals,
+      so a caller on another thread can show progress while the operation runs.
+    Create one per operation, since it counts the status checks made so far.
+    """
+
+    def __init__(self, page_count=1, stats=None, **kwargs):
+        super().__init__(timeout=OCR_POLL_INTERVAL, **kwargs)
+        self.page_count = max(1, page_count or 1)
+        self.stats = stats if stats is not None else {}
+        self._polls = 0
+
+    def next_interval(self):
+        """Delay before the next status check when the service gives no Retry-After."""
+        if self._polls == 0:
+            return OCR_POLL_FIRST_DELAY + OCR_POLL_SECONDS_PER_PAGE * (self.page_count - 1)
+        return min(OCR_POLL_MAX_INTERVAL, OCR_POLL_INTERVAL * OCR_POLL_BACKOFF ** (self._polls - 1))
+
+    async def _poll(self):
+        # The base class checks the status as soon as the operation is accepted, which is never
+        # done that early; wait the first delay before that check too
+        if not self.finished():
+            await self._delay()
+        await super()._poll()
+
+    async def update_status(self):
+        await super().update_status()
+        self._polls += 1
+        self.stats["ocr_polls"] = self.stats.get("ocr_polls", 0) + 1
+
+    def _extract_delay(self):
+        # The base class returns the Retry-After header when present, otherwise self._timeout
+        self._timeout = self.next_interval()
+        delay = super()._extract_delay()
+        self.stats["ocr_poll_wait"] = self.stats.get("ocr_poll_wait", 0.0) + delay
+        return delay
@@ -0,0 +1,112 @@
+"""
+OCR pre-processing for Document Assignment & Labelling application.
+Shrinks uploads before they are sent to Azure Document Intelligence: image pages are converted
+to grayscale, deskewed and re-encoded at OCR-sufficient DPI, and PDFs are rewritten without
+unused objects. The original bytes are kept whenever processing does not make the file smaller.
+"""
+
+import io
+
+import pymupdf  # PyMuPDF
+from PIL import Image, ImageOps, ImageSequence
+
+from config import (
+    OCR_TARGET_DPI, OCR_MAX_LONG_SIDE, OCR_JPEG_QUALITY, OCR_DESKEW_MAX_ANGLE, OCR_DESKEW_STEP
+)
+from pdf_pages import is_pdf
+
+
+def preprocess_for_ocr(file_binary):
+    """
+    Returns (bytes to send to OCR, stats) where stats reports original_bytes, processed_bytes and saved_bytes.
+    Never raises: if the file cannot be processed the original bytes are returned.
+    """
+    try:
+        processed = _preprocess_pdf(file_binary) if is_pdf(file_binary) else _preprocess_image(file_binary)
+    except Exception:
+        processed = None
+    if not processed or len(processed) >= len(file_binary):
+        processed = file_binary
+    return processed, {
+        "original_bytes": len(file_binary),
+        "processed_bytes": len(processed),
+        "saved_bytes": len(file_binary) - len(processed)
+    }
+
+
+def _preprocess_pdf(file_binary):
+    """Downsamples over-resolved embedded images to grayscale and drops unused objects (as ez_save does)."""
+    with pymupdf.open(stream=file_binary, filetype="pdf") as doc:
+        # Document.rewrite_images only exists in newer PyMuPDF releases
+        if hasattr(doc, "rewrite_images"):
+            doc.rewrite_images(
+                dpi_threshold=OCR_TARGET_DPI + 50, dpi_target=OCR_TARGET_DPI,
+                quality=OCR_JPEG_QUALITY, set_to_gray=True
+            )
+        return doc.tobytes(garbage=3, deflate=True, clean=True)
+
+
+def _preprocess_image(file_binary):
+    """Re-encodes every frame as deskewed grayscale at OCR_TARGET_DPI; multi-frame images become a PDF."""
+    with Image.open(io.BytesIO(file_binary)) as image:
+        dpi = image.info.get("dpi", (0, 0))[0]
+        if image.format == "JPEG":
+            # Decode large photos at reduced resolution straight away; draft never goes below this size
+            scale = min(1.0, OCR_MAX_LONG_SIDE / max(image.size))
+            image.draft("L", (int(image.width * scale), int(image.height * scale)))
+        frames = [_prepare_frame(frame, dpi) for frame in ImageSequence.Iterator(image)]
+
+    buffer = io.BytesIO()
+    if len(frames) == 1:
+        frames[0].save(buffer, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True, dpi=(OCR_TARGET_DPI, OCR_TARGET_DPI))
+    else:
+        frames[0].save(
+            buffer, format="PDF", save_all=True, append_images=frames[1:],
+            resolution=OCR_TARGET_DPI, quality=OCR_JPEG_QUALITY
+        )
+    return buffer.getvalue()
+
+
+def _prepare_frame(frame, dpi):
+    frame = ImageOps.exif_transpose(frame).convert("L")
+
+    if dpi and dpi > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / dpi
+    else:
+        # Phone photos rarely carry a meaningful DPI, so cap the long side instead
+        scale = min(1.0, OCR_MAX_LONG_SIDE / max(frame.size))
+    if scale < 1.0:
+        frame = frame.resize((max(1, int(frame.width * scale)), max(1, int(frame.height * scale))), Image.LANCZOS)
+
+    angle = _estimate_skew(frame)
+    if angle:
+        frame = frame.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return frame
+
+
+def _estimate_skew(gray):
+    """
+    Estimates page skew in degrees with a projection profile: text lines give the sharpest
+    row-by-row ink profile when they are horizontal. Returns 0 if the page already looks straight.
+    """
+    sample = ImageOps.invert(gray)
+    sample.thumbnail((800, 800))
+
+    def profile_score(angle):
+        rotated = sample.rotate(angle, resample=Image.BILINEAR, fillcolor=0) if angle else sample
+        # Resizing to one column averages each row, giving the ink profile cheaply
+        profile = list(rotated.resize((1, rotated.height), Image.BOX).getdata())
+        mean = sum(profile) / len(profile)
+        return sum((value - mean) ** 2 for value in profile)
+
+    best_angle, best_score = 0.0, profile_score(0)
+    steps = int(OCR_DESKEW_MAX_ANGLE / OCR_DESKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * OCR_DESKEW_STEP
+        if not angle:
+            continue
+        score = profile_score(angle)
+        # Require a clear improvement, so noise never rotates a straight page
+        if score > best_score * 1.02:
+            best_angle, best_score = angle, score
+    return best_angle
@@ -0,0 +1,143 @@
+"""
+PDF page helpers for Document Assignment & Labelling application.
+Uses PyMuPDF to read the embedded text layer of born-digital PDFs and to decide which pages
+still need to be sent to Azure Document Intelligence.
+"""
+
+import unicodedata
+
+import pymupdf  # PyMuPDF
+
+from config import (
+    PAGE_SELECTION_MIN_PAGES, PAGE_SELECTION_LEADING_PAGES, PAGE_SELECTION_TEXT_LAYER_COVERAGE, RULE_DECISIVE_CATEGORIES,
+    TEXT_LAYER_MIN_CHARS, TEXT_LAYER_MIN_DENSITY, TEXT_LAYER_MIN_ALNUM_RATIO, TEXT_LAYER_MAX_BAD_GLYPH_RATIO
+)
+from rule_classifier import match_categories
+
+
+def is_pdf(file_binary):
+    return file_binary[:5] == b"%PDF-"
+
+
+def format_page_ranges(page_numbers):
+    """Formats 1-based page numbers as a Document Intelligence pages string, e.g. [1, 2, 3, 7] -> '1-3,7'."""
+    ranges = []
+    for number in sorted(set(page_numbers)):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def is_usable_text(text, page_area):
+    """
+    Checks that a page's text layer is real text rather than a stamp on a scan or garbled glyphs.
+    - Character density: enough non-space characters for the page size (per 1000 square points).
+    - Glyph sanity: mostly letters and digits, and few replacement, private-use or control characters.
+    """
+    chars = [char for char in text if not char.isspace()]
+    if len(chars) < TEXT_LAYER_MIN_CHARS:
+        return False
+    if page_area and len(chars) / (page_area / 1000) < TEXT_LAYER_MIN_DENSITY:
+        return False
+
+    alnum = sum(1 for char in chars if char.isalnum())
+    bad = sum(1 for char in chars if char == "\ufffd" or unicodedata.category(char) in ("Co", "Cc", "Cs"))
+    return alnum / len(chars) >= TEXT_LAYER_MIN_ALNUM_RATIO and bad / len(chars) <= TEXT_LAYER_MAX_BAD_GLYPH_RATIO
+
+
+def read_text_layer(file_binary):
+    """
+    Reads the embedded text of every page of a PDF.
+    Returns a list with one entry per page: the page text if its text layer is usable, or None
+    for scanned pages that need OCR. Returns None if the file is not a PDF.
+    """
+    if not is_pdf(file_binary):
+        return None
+    with pymupdf.open(stream=file_binary, filetype="pdf") as doc:
+        page_texts = []
+        for page in doc:
+            text = page.get_text()
+            page_texts.append(text if is_usable_text(text, page.rect.width * page.rect.height) else None)
+        return page_texts
+
+
+def merge_page_texts(page_texts):
+    """Joins per-page texts in page order, in the same newline-separated form as the read model's content."""
+    return "\n".join(text.strip("\n") for text in page_texts if text)
+
+
+def split_pdf(file_binary, pages_per_shard, page_numbers=None):
+    """
+    Splits a PDF into standalone PDFs of up to pages_per_shard pages each, in page order.
+    Pass 1-based page_numbers to split only those pages: shard i then holds the i-th run of
+    pages_per_shard of them.
+    """
+    shards = []
+    with pymupdf.open(stream=file_binary, filetype="pdf") as doc:
+        numbers = sorted(set(page_numbers)) if page_numbers is not None else list(range(1, doc.page_count + 1))
+        for first in range(0, len(numbers), pages_per_shard):
+            with pymupdf.open() as shard:
+                for number in numbers[first:first + pages_per_shard]:
+                    shard.insert_pdf(doc, from_page=number - 1, to_page=number - 1)
+                shards.append(shard.tobytes(garbage=3, deflate=True))
+    return shards
+
+
+class PageSelection:
+    """
+    The pages of a PDF worth OCRing for classification.
+    - page_numbers: 1-based numbers of the selected pages, or None to analyse every candidate page.
+    - page_count: Total pages in the document.
+    - text_layer_coverage: Fraction of pages whose embedded text layer is usable.
+    - candidates: Numbers of the pages that need OCR; every page by default.
+    """
+
+    def __init__(self, page_numbers, page_count, text_layer_coverage, candidates=None):
+        self.page_numbers = sorted(page_numbers) if page_numbers is not None else None
+        self.page_count = page_count
+        self.text_layer_coverage = text_layer_coverage
+        self.candidates = sorted(candidates) if candidates is not None else list(range(1, page_count + 1))
+
+    def remaining_pages(self):
+        """Candidate page numbers left out of the selection, in page order."""
+        selected = set(self.page_numbers if self.page_numbers is not None else self.candidates)
+        return [number for number in self.candidates if number not in selected]
+
+    def is_confident(self, known_text):
+        """
+        True if the text known so far (the text layer plus OCR of the selected pages) is enough to classify on.
+        That needs keywords no skipped page can overturn: a category the rules never decide (e.g. Summons) or
+        several categories, which both go to the LLM whatever else the document says. A single rule-decided
+        category is not enough, since a skipped page may hold another category's keyword. Without keywords,
+        the selection is enough when the text layer covered the document.
+        """
+        matches = match_categories(known_text or "")
+        if matches:
+            return len(matches) > 1 or any(category not in RULE_DECISIVE_CATEGORIES for category in matches)
+        return self.text_layer_coverage >= PAGE_SELECTION_TEXT_LAYER_COVERAGE
+
+
+def select_pages(page_texts, candidates=None):
+    """
+    Picks the pages of a PDF worth OCRing from its text layer (see read_text_layer), among the candidate
+    page numbers that need OCR (every page by default): the first candidates, the last page, and any
+    page whose text mentions a classification keyword. Returns a PageSelection whose page_numbers is None when
+    every candidate should be analysed (few candidates, or nearly all of them selected).
+    """
+    page_count = len(page_texts)
+    candidates = sorted(candidates) if candidates is not None else list(range(1, page_count + 1))
+    coverage = sum(1 for text in page_texts if text) / page_count if page_count else 0.0
+    if len(candidates) <= PAGE_SELECTION_MIN_PAGES:
+        return PageSelection(None, page_count, coverage, candidates)
+
+    selected = set(candidates[:PAGE_SELECTION_LEADING_PAGES]) | {page_count}
+    for number, text in enumerate(page_texts, start=1):
+        if text and match_categories(text):
+            selected.add(number)
+    selected &= set(candidates)
+
+    if len(selected) >= len(candidates):
+        return PageSelection(None, page_count, coverage, candidates)
+    return PageSelection(selected, page_count, coverage, candidates)
@@ -0,0 +1,82 @@
+"""
+Preview rendering for Document Assignment & Labelling application.
+Renders small, compressed first-page thumbnails and caches them by content hash, so Streamlit
+reruns show previews instantly without re-decoding the upload.
+"""
+
+import io
+import math
+
+import pymupdf  # PyMuPDF
+from PIL import Image, ImageOps
+
+from caching import LRUCache, content_hash
+from config import (
+    PREVIEW_CACHE_MAX_ITEMS, PREVIEW_PDF_DPI, PREVIEW_FORMAT, PREVIEW_IMAGE_MAX_PIXELS, PREVIEW_IMAGE_QUALITY
+)
+
+_preview_cache = LRUCache(PREVIEW_CACHE_MAX_ITEMS)
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        image.save(buffer, format="JPEG", quality=PREVIEW_IMAGE_QUALITY, optimize=True)
+    elif image_format == "webp":
+        image.save(buffer, format="WEBP", quality=PREVIEW_IMAGE_QUALITY)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def pdf_preview(file_binary, dpi=PREVIEW_PDF_DPI, image_format=PREVIEW_FORMAT):
+    """
+    Returns an encoded thumbnail of the first page of a PDF, rendered at the given DPI.
+    file_binary should be the upload's getvalue() bytes: PyMuPDF reads them in place rather than
+    from another copy made by read().
+    """
+    cache_key = ("pdf", content_hash(file_binary), dpi, image_format)
+    preview = _preview_cache.get(cache_key)
+    if preview is not None:
+        return preview
+
+    zoom = dpi / 72
+    with pymupdf.open(stream=file_binary, filetype="pdf") as doc:
+        pixmap = doc.load_page(0).get_pixmap(matrix=pymupdf.Matrix(zoom, zoom))
+    if image_format == "webp":
+        preview = _encode(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples), image_format)
+    else:
+        preview = pixmap.tobytes("png")
+
+    _preview_cache.set(cache_key, preview)
+    return preview
+
+
+def _fit(size, max_pixels):
+    width, height = size
+    scale = min(1.0, math.sqrt(max_pixels / (width * height)))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def image_preview(file_binary, max_pixels=PREVIEW_IMAGE_MAX_PIXELS):
+    """
+    Returns a JPEG preview of an uploaded image, downscaled to at most max_pixels.
+    JPEGs are decoded at reduced resolution with draft(), so a large phone photo is never fully decoded.
+    Multi-page images (e.g. TIFF) are previewed from their first page.
+    """
+    cache_key = ("image", content_hash(file_binary), max_pixels)
+    preview = _preview_cache.get(cache_key)
+    if preview is not None:
+        return preview
+
+    with Image.open(io.BytesIO(file_binary)) as image:
+        # Only JPEG honours draft(); it picks the smallest DCT scale still at least this size
+        image.draft("RGB", _fit(image.size, max_pixels))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(_fit(image.size, max_pixels))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        preview = _encode(image, "jpeg")
+
+    _preview_cache.set(cache_key, preview)
+    return preview
@@ -0,0 +1,133 @@
+"""
+Client-side rate governor for Document Assignment & Labelling application.
+Keeps each model deployment under its tokens-per-minute and requests-per-minute quota with a pair
+of token buckets, so concurrent sessions queue smoothly instead of all hitting 429s together.
+
+Bucket state lives in this process by default. Set RATE_LIMIT_STATE_DB to a SQLite file path to
+share the buckets between worker processes on the same host; updates then run under a SQLite
+write lock.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+from config import MODEL_RATE_LIMITS, RATE_LIMIT_STATE_DB
+
+
+class _MemoryStore:
+    """Bucket state for this process only."""
+
+    blocking = False
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, fn):
+        with self._lock:
+            self._state[key], result = fn(self._state.get(key))
+            return result
+
+
+class _SQLiteStore:
+    """Bucket state shared by every process using the same SQLite file."""
+
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, requests REAL, updated REAL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def update(self, key, fn):
+        connection = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, requests, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            state, result = fn(row)
+            connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (key, *state))
+            connection.execute("COMMIT")
+            return result
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+
+class RateGovernor:
+    """
+    Token buckets per model: one for tokens (refilled at tokens_per_minute) and one for requests
+    (refilled at requests_per_minute). Each bucket holds at most one minute of quota.
+    """
+
+    def __init__(self, limits, store):
+        self.limits = limits
+        self.store = store
+
+    def reserve(self, model_name, tokens):
+        """
+        Takes tokens and one request from the model's buckets if both have room.
+        Returns 0 on success, or the seconds to wait before trying again.
+        Models without a configured limit are never throttled.
+        """
+        limit = self.limits.get(model_name)
+        if not limit:
+            return 0.0
+        token_capacity = limit["tokens_per_minute"]
+        request_capacity = limit["requests_per_minute"]
+        # A single request larger than the whole quota would otherwise wait forever
+        tokens = min(tokens, token_capacity)
+
+        def take(state):
+            now = time.time()
+            available_tokens, available_requests, updated = state or (token_capacity, request_capacity, now)
+            elapsed = max(0.0, now - updated)
+            available_tokens = min(token_capacity, available_tokens + elapsed * token_capacity / 60)
+            available_requests = min(request_capacity, available_requests + elapsed * request_capacity / 60)
+            if available_tokens >= tokens and available_requests >= 1:
+                return (available_tokens - tokens, available_requests - 1, now), 0.0
+            wait = max(
+                (tokens - available_tokens) * 60 / token_capacity,
+                (1 - available_requests) * 60 / request_capacity
+            )
+            return (available_tokens, available_requests, now), wait
+
+        return self.store.update(model_name, take)
+
+    async def acquire(self, model_name, tokens):
+        """Waits on the event loop until the model's quota allows a request of this many tokens."""
+        while True:
+            if self.store.blocking:
+                # Waiting for the SQLite lock must not stall the event loop
+                wait = await asyncio.to_thread(self.reserve, model_name, tokens)
+            else:
+                wait = self.reserve(model_name, tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Returns the process-wide rate governor."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            store = _SQLiteStore(RATE_LIMIT_STATE_DB) if RATE_LIMIT_STATE_DB else _MemoryStore()
+            _governor = RateGovernor(MODEL_RATE_LIMITS, store)
+        return _governor
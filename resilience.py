@@ -0,0 +1,208 @@
+"""
+Resilience layer for Document Assignment & Labelling application.
+Wraps calls to Azure endpoints (LLM deployments, Document Intelligence, Blob Storage) with
+jittered exponential backoff, Retry-After handling, a per-endpoint circuit breaker and a
+per-endpoint concurrency limit, so throttling bursts are absorbed instead of amplified.
+
+Usage, for a zero-argument callable (sync) or coroutine function (async):
+    get_endpoint("document_intelligence").call(fn)
+    await get_endpoint("llm:gpt-4o-mini").call_async(fn)
+"""
+
+import asyncio
+import random
+import threading
+import time
+import urllib.error
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+from config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRYABLE_STATUS_CODES,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, ENDPOINT_MAX_CONCURRENCY
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the endpoint while its circuit breaker is open."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"Endpoint '{endpoint}' is failing; calls paused for {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+# --- ERROR CLASSIFICATION ---
+
+def status_code(error):
+    """Returns the HTTP status code carried by an Azure SDK, urllib, requests or httpx error, if any."""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def retry_after(error):
+    """Returns the Retry-After delay in seconds requested by the service, if any."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error):
+    """True for throttling, server-side and connection failures that are worth retrying."""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, (
+        ServiceRequestError, ServiceResponseError, ConnectionError, TimeoutError,
+        asyncio.TimeoutError, urllib.error.URLError, requests.ConnectionError, requests.Timeout
+    ))
+
+
+def backoff_delay(attempt, error):
+    """Delay before retry number attempt: the service's Retry-After, else full-jitter exponential backoff."""
+    requested = retry_after(error)
+    if requested is not None:
+        return min(requested, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+# --- CIRCUIT BREAKER ---
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive transient failures and rejects calls for reset_seconds.
+    Then one trial call is let through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        """Raises CircuitOpenError while the circuit is open; returns True if this call is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(self.name, max(remaining, 0))
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Gives up the trial without an outcome (e.g. it was cancelled), so the next call becomes the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+# --- ENDPOINTS ---
+
+class Endpoint:
+    """Retry, circuit breaking and concurrency limiting for one remote endpoint."""
+
+    def __init__(self, name, max_concurrency=ENDPOINT_MAX_CONCURRENCY):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.max_concurrency = max_concurrency
+        self._sync_limiter = threading.BoundedSemaphore(max_concurrency)
+        self._async_limiter = None
+
+    def call(self, fn):
+        """Calls fn() from a regular thread, retrying transient failures."""
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            trial = self.breaker.before_call()
+            try:
+                with self._sync_limiter:
+                    result = fn()
+            except Exception as error:
+                if not self._should_retry(error, attempt):
+                    raise
+                time.sleep(backoff_delay(attempt, error))
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def call_async(self, fn):
+        """Awaits fn() on the pipeline event loop, retrying transient failures."""
+        if self._async_limiter is None:
+            self._async_limiter = asyncio.Semaphore(self.max_concurrency)
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            trial = self.breaker.before_call()
+            try:
+                async with self._async_limiter:
+                    result = await fn()
+            except Exception as error:
+                if not self._should_retry(error, attempt):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, error))
+            except BaseException:
+                # A cancelled trial (e.g. the losing side of a hedged request) must not keep the circuit open
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _should_retry(self, error, attempt):
+        if not is_transient(error):
+            # The endpoint answered, so it is up, even if this request was bad
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure()
+        return attempt < RETRY_MAX_ATTEMPTS and not self.breaker.is_open
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def get_endpoint(name):
+    """Returns the process-wide Endpoint for a name such as 'blob', 'document_intelligence' or 'llm:<model>'."""
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = Endpoint(name)
+        return _endpoints[name]
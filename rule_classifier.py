@@ -0,0 +1,118 @@
+"""
+Rule-based pre-classifier for Document Assignment & Labelling application.
+Decides unambiguous documents locally from the CLASSIFICATION_CATEGORIES keywords, so only
+ambiguous documents are sent to the LLM.
+
+All keywords are compiled into one regex and the document is scanned once (well under a
+millisecond for a MAX_CHARS document). A document is decided locally only when its keywords
+belong to exactly one category and that category is in RULE_DECISIVE_CATEGORIES. Summons always goes to the LLM because the
+description needs the defendant's name and the date of service.
+"""
+
+import re
+import threading
+from collections import Counter
+
+from config import CLASSIFICATION_CATEGORIES, RULE_DECISIVE_CATEGORIES, RULE_CLASSIFIER_NAME
+
+
+def _tokens(text):
+    """Splits text into lowercase letter and digit runs, e.g. 'Section 152(1)a' -> section 152 1 a."""
+    return re.findall(r'[a-z]+|\d+', text.lower())
+
+
+def _build_matcher(categories):
+    """
+    Returns (compiled regex, {normalised keyword: category}).
+    The regex is one plain alternation over lowercased text: no groups or leading lookbehind,
+    so the regex engine can skip ahead on the keywords' first characters.
+    """
+    keyword_categories = {}
+    for name, category in categories.items():
+        for keyword in category.get("keywords", []) + category.get("additional_terms", []):
+            keyword_categories[" ".join(_tokens(keyword))] = name
+
+    return re.compile(f"(?:{_alternation(keyword_categories)})(?![a-z0-9])"), keyword_categories
+
+
+def _alternation(keys):
+    """
+    Joins normalised keywords into one regex alternation.
+    Tokens may be separated by any spacing or punctuation, e.g. 'S.152' also matches 's 152' and 'S. 152'.
+    Longest first, so the most specific keyword is the one matched.
+    """
+    patterns = sorted((r'[\W_]*'.join(map(re.escape, key.split(" "))) for key in keys if key), key=len, reverse=True)
+    return "|".join(patterns)
+
+
+def keyword_pattern(keywords):
+    """
+    Compiles keywords into one case-insensitive regex matching them as whole words, with the same
+    spacing and punctuation tolerance as the rules, e.g. 'RTA' matches 'R.T.A.' but not 'portal'.
+    """
+    return re.compile(
+        f"(?<![a-z0-9])(?:{_alternation({' '.join(_tokens(keyword)) for keyword in keywords})})(?![a-z0-9])",
+        re.IGNORECASE
+    )
+
+
+_MATCHER, _KEYWORD_CATEGORIES = _build_matcher(CLASSIFICATION_CATEGORIES)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def match_categories(text_content):
+    """Returns {category: first matched keyword, lowercased} for every category whose keywords appear in the text."""
+    matches = {}
+    lowered = text_content.lower()
+    for match in _MATCHER.finditer(lowered):
+        start = match.start()
+        # Word boundary on the left, checked here so the pattern itself stays prefix-optimisable
+        if start and lowered[start - 1].isalnum():
+            continue
+        category = _KEYWORD_CATEGORIES.get(" ".join(_tokens(match.group(0))))
+        if category:
+            matches.setdefault(category, match.group(0))
+    return matches
+
+
+def classify_with_rules(text_content):
+    """
+    Classifies a document locally if the keywords make it unambiguous.
+    Returns a model-style result with a 'rule' field naming the rule that fired, or None
+    if the document must go to the LLM.
+    """
+    matches = match_categories(text_content or "")
+    decided = None
+    if len(matches) == 1:
+        category, matched_text = next(iter(matches.items()))
+        if category in RULE_DECISIVE_CATEGORIES:
+            decided = {
+                "class": RULE_DECISIVE_CATEGORIES[category],
+                "confidence": 1.0,
+                "details": None,
+                "rule": f"{category}: '{matched_text}'"
+            }
+
+    with _stats_lock:
+        _stats[f"rule:{decided['class']}" if decided else "llm"] += 1
+    return decided
+
+
+def rule_stats():
+    """Returns a copy of the per-process counters of rule hits and LLM fallbacks."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def result_model_name(model_result, model_name):
+    """
+    Returns the name to log a result under: the rule classifier if a rule fired, else the LLM,
+    which for routed results is the model that answered.
+    """
+    if model_result and model_result.get("rule"):
+        return RULE_CLASSIFIER_NAME
+    if model_result and model_result.get("model"):
+        return model_result["model"]
+    return model_name
@@ -1,34 +1,31 @@
 import streamlit as st
-from azure.storage.blob import BlobServiceClient
 import os
 from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeResult, AnalyzeDocumentRequest
-from azure.core.exceptions import HttpResponseError
-import pymupdf # PyMuPDF
-from PIL import Image
+from azure.ai.documentintelligence.models import AnalyzeResult
 import io
-import re
-import time
-from azure.core.exceptions import AzureError, ClientAuthenticationError
 from datetime import datetime
-import json
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
-import urllib.request
-import urllib.error
+from concurrent.futures import as_completed, wait
 
 # Import configuration
 from config import (
     AZURE_CONNECTION_STRING_KEY, CONTAINER_NAME, AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT_KEY,
     AZURE_DOCUMENT_INTELLIGENCE_KEY_KEY, AZURE_LLM_ENDPOINT_KEY, AZURE_LLM_API_KEY_KEY,
-    AVAILABLE_MODELS, DEFAULT_MODEL, MAX_CHARS, MAX_TOKENS, TEMPERATURE,
+    AVAILABLE_MODELS, DEFAULT_MODEL,
     DOCUMENT_TYPES, DOCUMENT_SUBTYPES, DOC_TYPE_MAP, SUBTYPE_MAP,
     CLASSIFICATION_CATEGORIES, SPECIAL_DEFENDANT_NAMES, SUPPORTED_FILE_TYPES,
-    MAX_DESCRIPTION_CHARS, FEEDBACK_STATUS, DOCUMENT_INTELLIGENCE_MODEL,
-    ERROR_MESSAGES, SUCCESS_MESSAGES, SYSTEM_PROMPT, JSON_OUTPUT_FORMAT
+    MAX_DESCRIPTION_CHARS, FEEDBACK_STATUS,
+    ERROR_MESSAGES, SUCCESS_MESSAGES, JSON_OUTPUT_FORMAT,
+    MODEL_ROUTING_ENABLED, ROUTER_MODEL_NAME, LLM_HEDGING_ENABLED
 )
+from async_pipeline import get_pipeline, submit
+from azure_clients import get_blob_service_client
+from feedback_sink import get_feedback_sink
+from hedging import hedge_budget
+from jobs import job_key, job_store
+from model_router import latency_tracker
+from previews import image_preview, pdf_preview
+from resilience import get_endpoint
+from rule_classifier import result_model_name, rule_stats
 
 # --- AZURE AND APP CONFIGURATION ---
 # Handle both Streamlit secrets and environment variables for Azure deployment
@@ -60,188 +57,35 @@ if __name__ == '__main__':
 
 # --- LLM AND COMPARISON FUNCTIONS (Updated to compare two LLMs) ---
 
-def get_llm_client():
-    """Initializes and returns the Azure ChatCompletionsClient for the LLMs."""
+def get_secret(key):
+    """Reads a secret from Streamlit secrets, falling back to environment variables."""
     try:
-        # Try Streamlit secrets first, then environment variables
-        try:
-            endpoint = st.secrets[AZURE_LLM_ENDPOINT_KEY]
-        except:
-            endpoint = os.getenv(AZURE_LLM_ENDPOINT_KEY)
-        
-        try:
-            api_key = st.secrets[AZURE_LLM_API_KEY_KEY]
-        except:
-            api_key = os.getenv(AZURE_LLM_API_KEY_KEY)
-        
-        if not endpoint or not api_key:
-            raise KeyError(f"Missing {AZURE_LLM_ENDPOINT_KEY} or {AZURE_LLM_API_KEY_KEY}")
-            
-        return ChatCompletionsClient(endpoint=endpoint, credential=AzureKeyCredential(api_key))
-    except KeyError as e:
-        st.error(ERROR_MESSAGES["MISSING_SECRET"].format(e, AZURE_LLM_ENDPOINT_KEY, AZURE_LLM_API_KEY_KEY))
-        return None
-
-def extract_text_for_llms(file_binary):
-    """Extracts text from a document using the Azure DI 'prebuilt-read' model for robust OCR."""
-    try:
-        client = DocumentIntelligenceClient(endpoint=ENDPOINT, credential=AzureKeyCredential(KEY))
-        poller = client.begin_analyze_document(DOCUMENT_INTELLIGENCE_MODEL, AnalyzeDocumentRequest(bytes_source=file_binary))
-        result = poller.result()
-        return result.content
-    except HttpResponseError as e:
-        st.error(ERROR_MESSAGES["TEXT_EXTRACTION_FAILED"].format(e.message))
-        return None
-
-# --- Start of updated code block ---
-def classify_with_model(text_content, model_name):
-    """Sends document text to a specified LLM for classification and conditional entity extraction."""
-    if not text_content:
-        st.warning(ERROR_MESSAGES["NO_TEXT_CONTENT"])
-        return {"class": "Error", "reason": "No text content provided"}
-
-    if len(text_content) > MAX_CHARS:
-        text_content = text_content[:MAX_CHARS]
-
-    user_prompt_template = (
-        "Analyze the following text. First, classify it. "
-        "### Categories:\n"
-        "1. **Summons**\n"
-        "   - A court-issued document notifying a party they are being sued.\n"
-        "   - Must contain references to 'Claim Form', 'Claim form', 'sealed Claim Form', or 'Writ' (case-insensitive, even if inside a covering letter).\n"
-        "   - May also include terms such as 'Particulars of Claim', 'Defendant Response Pack', or 'Statement of Truth'.\n\n"
-        "   - Will usually include fields for claimant's and defendant's names and addresses.\n\n"
-        "If the class is 'Summons':\n"
-        "- You MUST extract the defendant's name.\n"
-        "- Use the 'Issued' or 'Submitted' date (if available) as the date of service. Format as DD/MM.\n"
-        "- If the summons is against the Policy Holder then return 'PH' for the defendant's name.\n"
-        "- If there is a section called 'Defendant's Legal Representative' with the name of solicitors then return 'PAN' for the defendant's name.\n"
-        "- If the summons is against Admiral, EUI Ltd, or EUI Limited (including variants such as 'EUI Limited (Company Number:...)'), you MUST return exactly 'EUI' for the defendant's name.\n\n"
-        "If it is not a Summons, the 'Description' field should be null.\n"
-        "2. **Judgment**\n"
-        "   - An official court decision, often titled 'Judgment for Claimant' or 'General Form of Judgment or Order'.\n\n"
-        "3. **Solicitor_TP_S152**\n"
-        "   - Classify as Solicitor_TP_S152 if and ONLY if:\n"
-        "       - The text contains a clear reference to 'Section 152' (e.g., 'Section 152', 'S.152', 's152', 'Section 152 (1) (a)', 'Section 152(1)a').\n"
-        "       - OR the text contains a clear reference to 'Road Traffic Act' (e.g., 'Road Traffic Act', 'RTA', 'Road Traffic Act 1988').\n"
-        "       - The keywords are case-insensitive and can have spaces/punctuation between numbers/letters.\n"
-        "4. **Chaser**\n"
-        "- Only classify as Chaser if the document is a follow-up communication AND does NOT contain any legal or procedural terms that indicate a Summons, Judgment, or Solicitor_TP_S152 document.\n"
-        "- Do NOT classify as Chaser if text contains terms like 'Claim Form', 'Summons', 'Judgment', 'Writ', 'Section 151', 'Section 152', 'Road Traffic Act', or 'RTA 1988'.\n"
-        "- Any follow-up communication or repeated attempt to get a response,\n"
-        "  even if the reason or context is not explicitly stated.\n"
-        "- May reference a previous call, message, or action, OR simply indicate\n"
-        "  continued attempts to contact or follow up (e.g., 'I tried again today, no answer')\n"
-        "- Can include cases where:\n"
-        "   • The user receives claim-related communication but doesn't understand the context or origin.\n"
-        "   • The user seeks clarification of a claim.\n"
-        "   • The user expresses frustration over being contacted by phone and would prefer email communication.\n"
-        "   • The user says they prefer to be contacted via telephone.\n"
-        "   • The user has technical issues with access to documents sent by the claims handler.\n"
-        "5. **Other**\n"
-        "   - The text does not clearly fit any of the categories above.\n"
-        "Return ONLY the JSON object.\n\n"
-        "--- DOCUMENT TEXT BEGIN ---\n"
-        f"{text_content}\n"
-        "--- DOCUMENT TEXT END ---\n\n"
-        "JSON output format:\n"
-        "{\n"
-        '  "class": "<Summons|Judgment|Solicitor_TP_S152|Chaser|Other>",\n'
-        '  "confidence": <float between 0.0 and 1.0>,\n'
-        '  "details": {\n'
-        '    "defendant_name": "<The full name of the defendant (ignore Limited, Ltd, or use \'EUI\' if EUI Ltd / EUI Limited / Admiral, or \'PH\' if a company)>",\n'
-        '    "date_of_service": "<The date in DD/MM format>"\n'
-        "  } OR null\n"
-        "}"
+        return st.secrets[key]
+    except:
+        return os.getenv(key)
+
+def get_app_pipeline():
+    """Returns the shared async pipeline configured with this app's Azure secrets."""
+    return get_pipeline(
+        AZURE_CONNECTION_STRING, ENDPOINT, KEY,
+        get_secret(AZURE_LLM_ENDPOINT_KEY), get_secret(AZURE_LLM_API_KEY_KEY)
     )
-   
-    raw_response_content = None # This will hold the raw string from the model
-
-    try:
-        # --- IF THE MODEL IS MISTRAL, USE URLLIB REQUEST ---
-        # This assumes your mistral model name in the main app block will contain "mistral"
-        if "mistral" in model_name:
-            # Try Streamlit secrets first, then environment variables
-            try:
-                url = st.secrets['AZURE_LLM_ENDPOINT']
-            except:
-                url = os.getenv('AZURE_LLM_ENDPOINT')
-            
-            try:
-                api_key = st.secrets['AZURE_LLM_API_KEY']
-            except:
-                api_key = os.getenv('AZURE_LLM_API_KEY')
-            
-            if not api_key or not url:
-                raise Exception("AZURE_LLM_ENDPOINT or AZURE_LLM_API_KEY secrets are not set.")
-
-            # Construct the request data in the Mistral format
-            data = {
-                "input_data": {
-                    "input_string": [
-                        {
-                            "role": "user",
-                            "content": f"{SYSTEM_PROMPT}\n{user_prompt_template}"
-                        }
-                    ],
-                    "parameters": {
-                        "max_new_tokens": 250,
-                        "temperature": 0.0,
-                        "return_full_text": False
-                    }
-                }
-            }
-
-            body = str.encode(json.dumps(data))
-            headers = {'Content-Type':'application/json', 'Authorization':('Bearer '+ api_key)}
-            req = urllib.request.Request(url, body, headers)
-           
-            response = urllib.request.urlopen(req)
-            result = response.read()
-            # The response from Azure ML endpoints is often a JSON string containing a list,
-            # with the model's output as the first element.
-            response_json = json.loads(result.decode('utf-8'))
-            raw_response_content = response_json[0]
 
+def start_classification_job(file_binary, model_name):
+    """
+    Starts the background job that OCRs and classifies a document, or joins the one already
+    running or finished for the same document and model. Returns the job key to poll.
+    """
+    key = job_key(file_binary, model_name)
+    job_store.submit(key, lambda stats: get_app_pipeline().analyze(file_binary, model_name, stats))
+    return key
 
-        # --- ELSE, USE THE AZURE AI SDK (FOR PHI-4 etc.) ---
-        else:
-            client = get_llm_client()
-            if not client:
-                return {"class": "Error", "reason": "LLM client initialization failed"}
-           
-            # This format is for Phi-4
-            response = client.complete(
-                messages=[SystemMessage(content=system_prompt), UserMessage(content=user_prompt_template)],
-                model=model_name,
-                max_tokens=250,
-                temperature=0.0,
-            )
-            raw_response_content = response.choices[0].message.content
-
-        # --- COMMON RESPONSE PARSING FOR BOTH MODELS ---
-        if raw_response_content:
-            # Find the JSON object within the response, in case the model adds extra text
-            json_match = re.search(r'\{.*\}', raw_response_content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-           
-            st.error(f"LLM Error ({model_name}): No JSON object found in response. Raw: {raw_response_content}")
-            return {"class": "Error", "reason": "No JSON object in response"}
-       
-        # This case is reached if no response was generated by either method
-        st.error(f"LLM Error ({model_name}): No response content was generated.")
-        return {"class": "Error", "reason": "No response content generated"}
-
-    except urllib.error.HTTPError as error:
-        st.error(f"LLM Request Failed ({model_name}) with status code: {error.code}")
-        st.error(f"Details: {error.read().decode('utf8', 'ignore')}")
-        return {"class": "Error", "reason": f"HTTP Error {error.code}"}
-    except (ClientAuthenticationError, HttpResponseError, Exception) as e:
-        st.error(f"LLM Classification Error ({model_name}): {e}")
-        return {"class": "Error", "reason": str(e)}
-# --- End of updated code block ---
-
+def wait_for_job(job, progress):
+    """Blocks this script run until the job finishes, showing OCR progress in the st.empty() placeholder."""
+    while not wait([job.future], timeout=0.25).done:
+        stats = job.stats
+        progress.caption(f"OCR running: {stats.get('ocr_polls', 0)} status checks, {stats.get('ocr_poll_wait', 0.0):.1f}s waited")
+    progress.empty()
 
 def normalize_and_describe_model_result(model_result):
     """Converts an LLM result into a standard (DocType, SubType, Description) tuple."""
@@ -269,34 +113,101 @@ def normalize_and_describe_model_result(model_result):
         return ("Insured", "Query Chaser", "")
     return ("Other", "Other", "")
 
-def sanitize_for_blob_name(text: str) -> str:
-    """Removes characters that are not permitted in Azure Blob Storage filenames."""
-    # Removes characters: \ / : * ? " < > |
-    return re.sub(r'[\\/:*?"<>|]', '', text)
-
 # --- UI AND DISPLAY FUNCTIONS ---
 
+def put_blob(file_data, blob_name):
+    """Writes bytes to a blob in the app container, raising on failure. Safe to call from worker threads."""
+    blob_service_client = get_blob_service_client(AZURE_CONNECTION_STRING)
+    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+    get_endpoint("blob").call(lambda: blob_client.upload_blob(file_data, overwrite=True))
+
 def upload_to_blob(file_data, filename):
     """Uploads a file to Azure Blob Storage."""
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=filename)
-        blob_client.upload_blob(file_data, overwrite=True)
+        put_blob(file_data, filename)
         st.success(f"File '{filename}' uploaded successfully to blob storage.")
     except Exception as e:
         st.error(f"Error uploading file to blob: {str(e)}")
 
 def render_pdf(file):
-    doc = pymupdf.open(stream=file.read(), filetype="pdf")
-    page = doc.load_page(0)
-    st.image(page.get_pixmap().tobytes(), caption='First page of PDF')
+    """Shows a cached thumbnail of the first page of an uploaded PDF."""
+    st.image(pdf_preview(file.getvalue()), caption='First page of PDF')
 
 def render_image(file):
-    st.image(Image.open(file), caption='Uploaded Image')
+    """Shows a cached, downscaled preview of an uploaded image."""
+    st.image(image_preview(file.getvalue()), caption='Uploaded Image')
+
+# --- BATCH PROCESSING FUNCTIONS ---
+
+def batch_result_row(outcome):
+    """Converts an async pipeline outcome into a row of the batch results table."""
+    model_result = outcome["model_result"]
+    doc_type, sub_type, description = normalize_and_describe_model_result(model_result)
+    row = {
+        "File": outcome["filename"], "Document Type": doc_type, "SubType": sub_type,
+        "Description": description, "Confidence": None, "Status": "Done"
+    }
+    if model_result.get("class") == "Error":
+        row["Status"] = "Error"
+    elif isinstance(model_result.get("confidence"), (int, float)):
+        row["Confidence"] = round(float(model_result["confidence"]), 2)
+    row["OCR KB saved"] = round(outcome["ocr_stats"].get("saved_bytes", 0) / 1024)
+    row["OCR polls"] = outcome["ocr_stats"].get("ocr_polls", 0)
+    row["OCR poll wait (s)"] = round(outcome["ocr_stats"].get("ocr_poll_wait", 0.0), 1)
+    if outcome["upload_error"]:
+        row["Status"] = ERROR_MESSAGES["UPLOAD_ERROR"].format(outcome["upload_error"])
+    return row
+
+def batch_mode(model_name):
+    """Classifies many uploaded files concurrently, streaming results into a table as they finish."""
+    uploaded_files = st.file_uploader(
+        "Upload files to classify in one batch.", accept_multiple_files=True, key="batch_files"
+    )
+    if uploaded_files and st.button(f"Classify {len(uploaded_files)} documents"):
+        rows = []
+        progress = st.progress(0.0, text="Starting batch...")
+        table = st.empty()
+        # The pipeline bounds concurrency itself (BATCH_MAX_WORKERS documents at a time)
+        pipeline = get_app_pipeline()
+        futures = [submit(pipeline.process(f.getvalue(), f.name, model_name)) for f in uploaded_files]
+        for done, future in enumerate(as_completed(futures), start=1):
+            rows.append(batch_result_row(future.result()))
+            progress.progress(done / len(futures), text=f"Classified {done} of {len(futures)} documents")
+            table.dataframe(rows, use_container_width=True)
+        st.session_state["batch_results"] = rows
+    elif st.session_state.get("batch_results"):
+        st.dataframe(st.session_state["batch_results"], use_container_width=True)
 
 def main():
     st.title("Document Assignment & Labelling")
-    uploaded_file = st.file_uploader("Upload a file, view it, then classify it.")
+
+    # Confirmation queued by the previous run's feedback submit
+    feedback_toast = st.session_state.pop("feedback_toast", None)
+    if feedback_toast:
+        st.toast(feedback_toast[0], icon=feedback_toast[1])
+
+    # Set the model to use: the router escalates across ROUTER_MODELS, otherwise DEFAULT_MODEL alone
+    model_a = ROUTER_MODEL_NAME if MODEL_ROUTING_ENABLED else DEFAULT_MODEL
+
+    stats = rule_stats()
+    if stats:
+        rule_hits = sum(count for key, count in stats.items() if key.startswith("rule:"))
+        st.sidebar.caption(f"Rule fast path: {rule_hits} of {rule_hits + stats.get('llm', 0)} documents decided without the LLM")
+    for model_name, latency in latency_tracker.summary().items():
+        if latency["p50"] is not None:
+            st.sidebar.caption(f"{model_name}: p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s over {latency['calls']} calls")
+    if LLM_HEDGING_ENABLED:
+        st.sidebar.caption(f"Hedged LLM requests: {hedge_budget.rate:.0%} of recent calls")
+
+    mode = st.radio("Mode", ("Single document", "Batch"), horizontal=True)
+    if mode == "Batch":
+        batch_mode(model_a)
+        return
+
+    # A new key gives an empty uploader once feedback for the previous document is in
+    uploaded_file = st.file_uploader(
+        "Upload a file, view it, then classify it.", key=f"single_file_{st.session_state.get('document_number', 0)}"
+    )
    
     if uploaded_file is not None:
         st.session_state["filename"] = uploaded_file.name
@@ -306,7 +217,7 @@ def main():
             upload_to_blob(file_binary, uploaded_file.name)
             # --- CHANGE START ---
             # Clear previous results and feedback choices on new upload
-            for key in ["classification_complete", "model_a_result", "feedback_choice"]:
+            for key in ["classification_complete", "model_a_result", "feedback_choice", "job_key"]:
                 if key in st.session_state:
                     del st.session_state[key]
             # --- CHANGE END ---
@@ -318,46 +229,56 @@ def main():
             else:
                 st.write("Unsupported file type. Please upload a PDF or image.")
 
-    # --- CHANGE START ---
-    # Set the model to use
-    model_a = "Phi-4-multimodal-instruct"
-    # model_a = "gpt-4o-mini"
-    # model_a = "mistralai-mistral-7b-instruc-11"
-
     # Initialize session state keys if they don't exist
     for key in ["classification_complete", "model_a_result"]:
         if key not in st.session_state:
             st.session_state[key] = {} if key.endswith('_result') else False
-    # --- CHANGE END ---
 
     if st.button("Classify document"):
         if "uploaded_filename" not in st.session_state:
             st.warning("Please upload a file and click 'Upload and view first page' first.")
         else:
-            # --- CHANGE START ---
-            with st.spinner(f"Extracting text and analyzing with {model_a}... This may take a moment."):
-                text_content = extract_text_for_llms(st.session_state.uploaded_filename)
-               
-                st.write(f"This is the text being sent to the LLM:\n\n{text_content}\n\n")
-
-                # Run the classification model
-                st.session_state.model_a_result = classify_with_model(text_content, model_name=model_a)
-               
-                st.session_state.classification_complete = True
-                # Reset feedback choice on new classification
-                if 'feedback_choice' in st.session_state:
-                    del st.session_state['feedback_choice']
-            # --- CHANGE END ---
+            # The work runs in the background, so reruns and reconnects poll the same job instead of restarting it
+            st.session_state.job_key = start_classification_job(st.session_state.uploaded_filename, model_a)
+            st.session_state.classification_complete = False
+            # Reset feedback choice on new classification
+            if 'feedback_choice' in st.session_state:
+                del st.session_state['feedback_choice']
+
+    job = job_store.get(st.session_state.get("job_key"))
+    if job is not None and not st.session_state.classification_complete:
+        # --- CHANGE START ---
+        with st.spinner(f"Extracting text and analyzing with {model_a}... This may take a moment."):
+            wait_for_job(job, st.empty())
+        if job.failed:
+            error = job.future.exception()
+            st.error(ERROR_MESSAGES["TEXT_EXTRACTION_FAILED"].format(getattr(error, "message", error)))
+            del st.session_state["job_key"]
+        else:
+            ocr_stats = job.stats
+            if ocr_stats.get("saved_bytes"):
+                st.caption(f"OCR pre-processing saved {ocr_stats['saved_bytes'] / 1024:.0f} KB of {ocr_stats['original_bytes'] / 1024:.0f} KB")
+            if ocr_stats.get("ocr_polls"):
+                st.caption(f"OCR polling: {ocr_stats['ocr_polls']} status checks, {ocr_stats['ocr_poll_wait']:.1f}s waited")
+
+            outcome = job.future.result()
+            st.write(f"This is the text being sent to the LLM:\n\n{outcome['text_content']}\n\n")
+
+            st.session_state.model_a_result = outcome["model_result"]
+            st.session_state.classification_complete = True
+        # --- CHANGE END ---
 
 
     if st.session_state.classification_complete:
+        # Results decided by the keyword rules are shown and logged under the rule classifier's name
+        result_model = result_model_name(st.session_state.model_a_result, model_a)
         st.markdown("---")
         st.header("Classification Result")
        
         # --- CHANGE START ---
         # Display the single model's result
         with st.container(border=True):
-            st.subheader(f"{model_a} Result")
+            st.subheader(f"{result_model} Result")
             display_model_results(st.session_state.model_a_result)
        
         st.markdown("---")
@@ -388,17 +309,15 @@ def main():
                     if submitted:
                         if st.session_state.feedback_choice == "Correct":
                             # Log the model as correct.
-                            res = upload_feedback_blob(model_a_result, model_a, actual_classification=None)
+                            res = upload_feedback_blob(model_a_result, result_model, actual_classification=None)
                             if res:
-                                st.toast(f"Feedback recorded: {model_a} was correct.", icon="✅")
-                                time.sleep(4); st.rerun()
+                                next_document(f"Feedback recorded: {result_model} was correct.", icon="✅")
                         else: # Incorrect
                             # Log the model as incorrect against the manual entry.
                             actual_manual = (st.session_state.doc_type_s, st.session_state.sub_type_s, st.session_state.description_s)
-                            res = upload_feedback_blob(model_a_result, model_a, actual_classification=actual_manual)
+                            res = upload_feedback_blob(model_a_result, result_model, actual_classification=actual_manual)
                             if res:
-                                st.toast(f"Feedback recorded: {model_a} was incorrect.", icon="❌")
-                                time.sleep(4); st.rerun()
+                                next_document(f"Feedback recorded: {result_model} was incorrect.", icon="❌")
         else:
             # This block handles the case where the model failed classification (returned an error)
             st.info("Model could not classify the document. Please provide the correct classification manually.")
@@ -413,10 +332,9 @@ def main():
                 if submitted:
                     actual_manual = (st.session_state.doc_type_e, st.session_state.sub_type_e, st.session_state.description_e)
                     # Log feedback for the model against the manual entry
-                    res = upload_feedback_blob(model_a_result, model_a, actual_classification=actual_manual)
+                    res = upload_feedback_blob(model_a_result, result_model, actual_classification=actual_manual)
                     if res:
-                        st.toast("Feedback for failed analysis recorded.", icon="✅")
-                        time.sleep(4); st.rerun()
+                        next_document("Feedback for failed analysis recorded.", icon="✅")
         # --- CHANGE END ---
 
 def display_model_results(model_result):
@@ -433,12 +351,40 @@ def display_model_results(model_result):
    
     confidence = model_result.get('confidence', 'N/A')
     st.write(f"**Model Confidence:** {confidence:.2f}" if isinstance(confidence, float) else f"**Model Confidence:** {confidence}")
+    prompt_stats = model_result.get('prompt_stats')
+    if prompt_stats:
+        st.caption(
+            f"Prompt: {prompt_stats['prompt_tokens']} tokens (document {prompt_stats['kept_tokens']} "
+            f"of {prompt_stats['document_tokens']} estimated tokens kept)"
+        )
+    if model_result.get('rule'):
+        st.caption(f"Decided locally by rule {model_result['rule']}; the LLM was not called.")
+    routing = model_result.get('routing')
+    if routing and len(routing) > 1:
+        steps = [
+            f"{attempt['model']} ({attempt['confidence']:.2f})" if attempt["outcome"] == "ok" else f"{attempt['model']} ({attempt['outcome']})"
+            for attempt in routing
+        ]
+        st.caption(f"Routed: {' → '.join(steps)}")
 
 # --- FEEDBACK FUNCTIONS ---
 
+def next_document(message, icon):
+    """
+    Confirms recorded feedback and moves straight on to the next document.
+    The toast is queued for the next run instead of holding this one with a sleep, and the
+    document's state is cleared so the rerun starts with an empty uploader.
+    """
+    st.session_state["feedback_toast"] = (message, icon)
+    for key in ["classification_complete", "model_a_result", "feedback_choice", "job_key", "uploaded_filename", "filename"]:
+        st.session_state.pop(key, None)
+    st.session_state["document_number"] = st.session_state.get("document_number", 0) + 1
+    st.rerun()
+
 def upload_feedback_blob(model_prediction, model_name, actual_classification):
     """
-    Uploads a feedback signal file for a specific model to Azure Blob Storage.
+    Records a feedback signal for a specific model. Records are logged locally and shipped to
+    Azure Blob Storage in batches by the feedback sink.
     - model_prediction: The raw JSON result from the model being logged.
     - model_name: The string name of the model (e.g., 'gpt-4o-mini').
     - actual_classification: None if the prediction was correct, or a normalized
@@ -473,23 +419,22 @@ def upload_feedback_blob(model_prediction, model_name, actual_classification):
         actual_sub_type = sub_type_map.get(correct_sub_type_full, "manual")
         actual_desc = correct_desc if correct_desc else "NA"
 
-    # Sanitize the description parts for the blob name
-    predicted_desc = sanitize_for_blob_name(predicted_desc)
-    actual_desc = sanitize_for_blob_name(actual_desc)
-
     try:
         timestamp = datetime.now().strftime("%y%m%d%H%M%S")
         status = "S" if is_correct else "F"
-       
-        # Updated blob name format to include all required fields
-        blob_name = f"{status}___{timestamp}___{model_name}___{predicted_doc_type}___{predicted_sub_type}___{predicted_desc}___{actual_doc_type}___{actual_sub_type}___{actual_desc}___{st.session_state['filename']}.txt"
-       
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
-        blob_client.upload_blob(b"", overwrite=True)
+
+        # Same fields as the S___timestamp___model___... blob names used before the feedback sink
+        get_feedback_sink(AZURE_CONNECTION_STRING).add({
+            "status": status, "timestamp": timestamp, "model": model_name,
+            "predicted_doc_type": predicted_doc_type, "predicted_sub_type": predicted_sub_type,
+            "predicted_description": predicted_desc,
+            "actual_doc_type": actual_doc_type, "actual_sub_type": actual_sub_type,
+            "actual_description": actual_desc,
+            "filename": st.session_state['filename']
+        })
         return True
-    except (KeyError, AzureError, Exception) as ex:
-        st.error(f"Failed to upload feedback signal to Blob Storage: {ex}")
+    except (KeyError, OSError, Exception) as ex:
+        st.error(f"Failed to record feedback signal: {ex}")
         return False
 
 
@@ -0,0 +1,131 @@
+import asyncio
+
+import pymupdf
+import pytest
+
+import async_pipeline
+from async_pipeline import AsyncPipeline, SingleFlight
+from caching import LRUCache
+
+
+def scanned_pdf(page_count):
+    """A PDF of blank pages, which have no usable text layer and so all need OCR."""
+    with pymupdf.open() as doc:
+        for _ in range(page_count):
+            doc.new_page()
+        return doc.tobytes()
+
+
+def counted_call(calls, result, seconds=0.05):
+    """A coroutine factory that counts its calls and returns (or raises) result after seconds."""
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(seconds)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def test_single_flight_collapses_concurrent_identical_calls():
+    async def main():
+        flight, calls = SingleFlight(), []
+        results = await asyncio.gather(*(flight.do("key", counted_call(calls, "text")) for _ in range(5)))
+        other = await flight.do("other", counted_call(calls, "other text"))
+        return results, other, calls
+
+    results, other, calls = asyncio.run(main())
+    assert results == ["text"] * 5
+    assert other == "other text"
+    assert len(calls) == 2
+
+
+def test_single_flight_forgets_keys_once_the_call_finishes():
+    async def main():
+        flight, calls = SingleFlight(), []
+        await flight.do("key", counted_call(calls, "text"))
+        await flight.do("key", counted_call(calls, "text"))
+        return flight, calls
+
+    flight, calls = asyncio.run(main())
+    assert len(calls) == 2
+    assert flight._tasks == {}
+
+
+def test_single_flight_shares_errors_with_every_caller():
+    async def main():
+        flight, calls = SingleFlight(), []
+        results = await asyncio.gather(
+            flight.do("key", counted_call(calls, RuntimeError("OCR failed"))),
+            flight.do("key", counted_call(calls, RuntimeError("OCR failed"))),
+            return_exceptions=True
+        )
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+
+
+def test_single_flight_caller_giving_up_does_not_cancel_the_call_for_others():
+    async def main():
+        flight, calls = SingleFlight(), []
+        impatient = asyncio.ensure_future(flight.do("key", counted_call(calls, "text", seconds=0.1)))
+        patient = asyncio.ensure_future(flight.do("key", counted_call(calls, "text")))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient, impatient.cancelled(), calls
+
+    result, cancelled, calls = asyncio.run(main())
+    assert result == "text"
+    assert cancelled
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(async_pipeline, "ocr_cache", LRUCache(16))
+    monkeypatch.setattr(async_pipeline, "OCR_PREPROCESSING_ENABLED", False)
+    return AsyncPipeline("connection-string", "https://di.example", "di-key", "https://llm.example", "llm-key")
+
+
+def test_selective_ocr_does_not_let_the_rules_decide_on_partial_text(pipeline, monkeypatch):
+    # Page 1 mentions an RTA claim, which alone the rules decide as Section 152; page 6 is the Claim Form
+    ocr_text = {number: f"Page {number} of the bundle" for number in range(1, 11)}
+    ocr_text[1] = "Re: your client's RTA claim"
+    ocr_text[6] = "Please find enclosed the sealed Claim Form"
+    ocr_requests, routed = [], []
+
+    async def ocr_pages(file_binary, page_numbers, stats):
+        ocr_requests.append(list(page_numbers))
+        return {number: ocr_text[number] for number in page_numbers}
+
+    async def route(text_content, model_name):
+        routed.append(text_content)
+        return {"class": "Summons", "confidence": 0.9}
+
+    monkeypatch.setattr(pipeline, "_ocr_pages", ocr_pages)
+    monkeypatch.setattr(pipeline, "route", route)
+    outcome = asyncio.run(pipeline.analyze(scanned_pdf(10), "gpt-4o-mini"))
+
+    assert ocr_requests == [[1, 2, 3, 10], [4, 5, 6, 7, 8, 9]]
+    assert "sealed Claim Form" in outcome["text_content"]
+    assert outcome["model_result"] == {"class": "Summons", "confidence": 0.9}
+    assert len(routed) == 1
+
+
+def test_concurrent_extractions_of_one_document_share_one_ocr_run(pipeline, monkeypatch):
+    ocr_requests = []
+
+    async def ocr_pages(file_binary, page_numbers, stats):
+        ocr_requests.append(list(page_numbers))
+        await asyncio.sleep(0.05)
+        return {number: f"Page {number}" for number in page_numbers}
+
+    async def main(file_binary):
+        return await asyncio.gather(*(pipeline.extract_text(file_binary) for _ in range(3)))
+
+    monkeypatch.setattr(pipeline, "_ocr_pages", ocr_pages)
+    texts = asyncio.run(main(scanned_pdf(2)))
+    assert texts == ["Page 1\nPage 2"] * 3
+    assert ocr_requests == [[1, 2]]
@@ -0,0 +1,66 @@
+import os
+
+from caching import DiskCache, LRUCache, TieredCache, ocr_cache_key
+
+
+def age(cache, key, seconds_ago):
+    """Backdates an entry's last use, so eviction order does not depend on the file system's timestamp resolution."""
+    path = cache._path(key)
+    mtime = os.stat(path).st_mtime - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def entry_size(tmp_path):
+    probe = DiskCache(tmp_path / "probe", max_bytes=10 ** 6)
+    probe.set("k", "x" * 100)
+    return os.path.getsize(probe._path("k"))
+
+
+def test_disk_cache_round_trips_json(tmp_path):
+    cache = DiskCache(tmp_path / "ocr", max_bytes=10 ** 6)
+    cache.set("a", {"content": "text"})
+    assert cache.get("a") == {"content": "text"}
+    assert cache.get("missing", "default") == "default"
+
+
+def test_disk_cache_evicts_least_recently_used_entries_past_its_budget(tmp_path):
+    cache = DiskCache(tmp_path / "ocr", max_bytes=entry_size(tmp_path) * 2)
+    cache.set("old", "x" * 100)
+    age(cache, "old", 30)
+    cache.set("used", "x" * 100)
+    age(cache, "used", 20)
+    # Reading an entry marks it as recently used
+    assert cache.get("old") == "x" * 100
+
+    cache.set("new", "x" * 100)
+
+    assert cache.get("used") is None
+    assert cache.get("old") == "x" * 100
+    assert cache.get("new") == "x" * 100
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path / "ocr"))
+
+
+def test_lru_cache_evicts_least_recently_used_item():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    disk = DiskCache(tmp_path / "ocr", max_bytes=10 ** 6)
+    disk.set("a", "text")
+    cache = TieredCache(LRUCache(4), disk)
+    assert cache.get("a") == "text"
+    assert cache.memory.get("a") == "text"
+
+
+def test_ocr_cache_key_depends_on_content_model_and_mode():
+    keys = {
+        ocr_cache_key(b"%PDF-1"), ocr_cache_key(b"%PDF-2"),
+        ocr_cache_key(b"%PDF-1", model_id="prebuilt-layout"), ocr_cache_key(b"%PDF-1", mode="selective")
+    }
+    assert len(keys) == 4
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from classification import (
+    GAP_MARKER, JsonObjectScanner, ModelResponseError, budget_document_text, estimate_tokens, parse_model_response
+)
+from config import CHARS_PER_TOKEN, PROMPT_DOCUMENT_TOKEN_BUDGET, PROMPT_HEADER_TOKENS
+
+
+def test_scanner_returns_object_once_its_closing_brace_arrives():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('Sure! {"class": "Judg') is None
+    assert scanner.feed('ment", "details": {"a": 1}') is None
+    assert scanner.feed('} and some trailing chatter') == '{"class": "Judgment", "details": {"a": 1}}'
+    assert scanner.text.startswith("Sure!")
+
+
+def test_scanner_ignores_braces_and_escaped_quotes_inside_strings():
+    scanner = JsonObjectScanner()
+    answer = '{"reason": "mentions \\"{curly}\\" text }", "confidence": 0.9}'
+    result = scanner.feed(answer)
+    assert result == answer
+    assert json.loads(result)["confidence"] == 0.9
+
+
+def test_scanner_without_object_returns_none():
+    scanner = JsonObjectScanner()
+    assert scanner.feed("no json here") is None
+    assert scanner.feed("still } none") is None
+
+
+def test_budget_returns_short_text_unchanged():
+    text, stats = budget_document_text("A short letter.", budget_tokens=100)
+    assert text == "A short letter."
+    assert stats == {"document_tokens": 4, "kept_tokens": 4, "keyword_windows": 0}
+
+
+def test_budget_keeps_header_tail_and_keyword_windows():
+    header = "H" * (PROMPT_HEADER_TOKENS * CHARS_PER_TOKEN)
+    filler = "lorem ipsum dolor sit amet " * 2000
+    text = header + filler + " The Defendant was served on 3 May. " + filler + "Yours faithfully, Signed"
+    selected, stats = budget_document_text(text, budget_tokens=2000)
+
+    assert selected.startswith(header)
+    assert selected.endswith("Yours faithfully, Signed")
+    assert "The Defendant was served" in selected
+    assert GAP_MARKER in selected
+    assert stats["keyword_windows"] == 1
+    assert stats["document_tokens"] == estimate_tokens(text)
+    assert stats["kept_tokens"] < stats["document_tokens"]
+
+
+def test_budget_drops_page_numbers_and_repeated_headers():
+    page = "ACME SOLICITORS LLP\n" + "x" * 4000 + "\nPage 1 of 9\n"
+    selected, _ = budget_document_text(page * 5, budget_tokens=1000)
+    assert selected.count("ACME SOLICITORS LLP") == 1
+    assert "Page 1 of 9" not in selected
+
+
+def test_budget_keeps_a_late_category_keyword_behind_many_context_terms():
+    pages = [f"Page {number}: the Claimant wrote to the Defendant again about the matter. " * 40 for number in range(1, 61)]
+    pages[45] = pages[45][:800] + " Please find enclosed the sealed Claim Form served today. " + pages[45][800:]
+    selected, stats = budget_document_text("\n".join(pages))
+
+    assert "sealed Claim Form served today" in selected
+    assert stats["kept_tokens"] <= PROMPT_DOCUMENT_TOKEN_BUDGET + 10
+
+
+def test_budget_matches_keywords_as_whole_words():
+    filler = "certainly the portal has written confirmation " * 2000
+    _, stats = budget_document_text(filler, budget_tokens=2000)
+    assert stats["keyword_windows"] == 0
+
+
+def test_parse_model_response_extracts_the_json_object():
+    assert parse_model_response('Here you go:\n{"class": "Other", "confidence": 0.4}\nThanks') == {
+        "class": "Other", "confidence": 0.4
+    }
+
+
+@pytest.mark.parametrize("answer", ["", None, "I cannot classify this document."])
+def test_parse_model_response_rejects_answers_without_json(answer):
+    with pytest.raises(ModelResponseError):
+        parse_model_response(answer)
@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timezone
+
+from feedback_analytics import FeedbackTable, accuracy_by_model, confusion_matrices, parse_blob_name, refresh
+from config import FEEDBACK_BLOB_PREFIX
+
+NAME = "S___250301120000___gpt-4o-mini___C___J___NA___C___J___NA___claim.pdf.txt"
+
+
+class FakeBlob:
+    def __init__(self, name, last_modified):
+        self.name = name
+        self.last_modified = last_modified
+
+
+class FakeContainer:
+    """Stands in for a ContainerClient: blobs are {name: (data, last_modified)}."""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.listed_prefixes = []
+        self.downloads = []
+
+    def list_blobs(self, name_starts_with, results_per_page=None):
+        self.listed_prefixes.append(name_starts_with)
+        return [FakeBlob(name, modified) for name, (_, modified) in self.blobs.items() if name.startswith(name_starts_with)]
+
+    def download_blob(self, name):
+        self.downloads.append(name)
+        data = self.blobs[name][0]
+        return type("Downloader", (), {"readall": lambda self: data})()
+
+
+def modified(day):
+    return datetime(2025, 3, day, tzinfo=timezone.utc)
+
+
+def batch(*records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def test_parse_blob_name():
+    row = parse_blob_name(NAME)
+    assert row["status"] == "S"
+    assert row["timestamp"] == "250301120000"
+    assert row["model"] == "gpt-4o-mini"
+    assert (row["predicted_doc_type"], row["actual_sub_type"]) == ("C", "J")
+    assert row["filename"] == "claim.pdf"
+    assert row["key"] == NAME
+
+
+def test_parse_blob_name_keeps_separators_inside_the_filename():
+    row = parse_blob_name("F___250301120000___m___C___J___NA___O___O___NA___a___b.pdf.txt")
+    assert row["filename"] == "a___b.pdf"
+
+
+def test_parse_blob_name_ignores_other_blobs():
+    assert parse_blob_name("uploads/claim.pdf") is None
+    assert parse_blob_name("X___1___2___3___4___5___6___7___8___9") is None
+
+
+def test_refresh_loads_named_blobs_and_batches_once():
+    container = FakeContainer({
+        NAME: (b"", modified(1)),
+        f"{FEEDBACK_BLOB_PREFIX}2025/03/02.jsonl": (batch(
+            {"id": "a", "status": "F", "model": "Phi-4-multimodal-instruct",
+             "predicted_doc_type": "C", "actual_doc_type": "STP"},
+            {"id": "b", "status": "S", "model": "gpt-4o-mini", "predicted_doc_type": "C", "actual_doc_type": "C"}
+        ), modified(2)),
+    })
+    table = FeedbackTable()
+
+    assert refresh(table, container) == 3
+    assert table.watermark == modified(2).isoformat()
+    assert accuracy_by_model(table) == {"gpt-4o-mini": (2, 2), "Phi-4-multimodal-instruct": (0, 1)}
+    assert confusion_matrices(table)["Phi-4-multimodal-instruct"][("C", "STP")] == 1
+
+    # A second refresh finds nothing new
+    assert refresh(table, container) == 0
+    assert len(table) == 3
+
+
+def test_refresh_after_watermark_lists_recent_months_and_rereads_changed_batches():
+    container = FakeContainer({f"{FEEDBACK_BLOB_PREFIX}2025/03/02.jsonl": (batch({"id": "a", "status": "S"}), modified(2))})
+    table = FeedbackTable()
+    refresh(table, container)
+
+    # The append blob grows after the first refresh
+    container.blobs[f"{FEEDBACK_BLOB_PREFIX}2025/03/02.jsonl"] = (
+        batch({"id": "a", "status": "S"}, {"id": "b", "status": "F"}), modified(3)
+    )
+    container.listed_prefixes.clear()
+    assert refresh(table, container) == 1
+    assert len(table) == 2
+    # Only months from the watermark (less the margin) on are listed again
+    assert "S___2503" in container.listed_prefixes
+    assert not any(prefix < "S___2503" for prefix in container.listed_prefixes if prefix.startswith("S___"))
+
+
+def test_table_round_trips_through_the_cache_file(tmp_path):
+    table = FeedbackTable()
+    table.add(parse_blob_name(NAME))
+    table.watermark = modified(1).isoformat()
+    path = str(tmp_path / "table.json.gz")
+    table.save(path)
+
+    loaded = FeedbackTable.load(path)
+    assert len(loaded) == 1
+    assert loaded.watermark == table.watermark
+    assert not loaded.add(parse_blob_name(NAME))
@@ -0,0 +1,93 @@
+import json
+import os
+import socket
+
+import pytest
+
+import feedback_sink
+from feedback_sink import FeedbackSink
+
+HOST = socket.gethostname()
+
+
+@pytest.fixture(autouse=True)
+def quiet_sinks(monkeypatch):
+    # Sinks flush at exit and from a background thread; keep both away from the test's temp dirs
+    monkeypatch.setattr(feedback_sink.atexit, "register", lambda fn: None)
+    monkeypatch.setattr(feedback_sink.threading.Thread, "start", lambda self: None)
+
+
+def records(batches):
+    return [json.loads(line) for batch in batches for line in batch.decode("utf-8").splitlines()]
+
+
+def write_log(directory, name, *rows):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as log:
+        log.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+def dead_pid():
+    """The PID of a child process that has already exited."""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+def test_records_are_logged_then_shipped_in_one_batch(tmp_path):
+    batches = []
+    sink = FeedbackSink(str(tmp_path), batches.append, flush_records=100)
+    ids = [sink.add({"status": "S", "model": "gpt-4o-mini"}) for _ in range(3)]
+    assert batches == []
+
+    assert sink.flush()
+    assert [record["id"] for record in records(batches)] == ids
+    assert len(batches) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_batches_stay_on_disk_for_the_next_flush(tmp_path):
+    batches = []
+
+    def write_batch(data):
+        if not batches:
+            batches.append(None)
+            raise ConnectionError("storage unavailable")
+        batches.append(data)
+
+    sink = FeedbackSink(str(tmp_path), write_batch)
+    record_id = sink.add({"status": "F"})
+    assert not sink.flush()
+    assert len(os.listdir(tmp_path)) == 1
+
+    assert sink.flush()
+    assert [record["id"] for record in records(batches[1:])] == [record_id]
+
+
+def test_logs_of_stopped_processes_on_this_host_are_recovered(tmp_path):
+    pid = dead_pid()
+    write_log(tmp_path, f"wal-{HOST}@{pid}.jsonl", {"id": "unsealed"})
+    write_log(tmp_path, f"batch-{HOST}@{pid}-1.jsonl", {"id": "sealed"})
+
+    batches = []
+    assert FeedbackSink(str(tmp_path), batches.append).flush()
+    assert sorted(record["id"] for record in records(batches)) == ["sealed", "unsealed"]
+
+
+def test_logs_of_other_hosts_and_running_processes_are_left_alone(tmp_path):
+    # Another instance sharing the directory, possibly with the same PID as this process; its PIDs
+    # cannot be checked from here
+    names = [f"wal-other-{HOST}@{os.getpid()}.jsonl", f"batch-other-{HOST}@{dead_pid()}-1.jsonl"]
+    # A live process on this host
+    names.append(f"wal-{HOST}@{os.getppid()}.jsonl")
+    for name in names:
+        write_log(tmp_path, name, {"id": name})
+
+    batches = []
+    sink = FeedbackSink(str(tmp_path), batches.append)
+    sink.add({"status": "S"})
+    assert sink.flush()
+
+    assert [record["status"] for record in records(batches)] == ["S"]
+    assert sorted(os.listdir(tmp_path)) == sorted(names)
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from hedging import HedgeBudget, first_success
+
+
+def call(result=None, delay=0.0, error=None, log=None, name=None):
+    async def fn():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"{name} cancelled")
+            raise
+        if error:
+            raise error
+        return result
+    return fn
+
+
+def test_fast_primary_is_not_hedged():
+    budget = HedgeBudget(max_rate=1.0)
+    hedge_calls = []
+
+    async def hedge():
+        hedge_calls.append(1)
+
+    result = asyncio.run(first_success(call("primary"), hedge, delay=1.0, budget=budget))
+    assert result == ("primary", "primary")
+    assert not hedge_calls
+    assert budget.rate == 0.0
+
+
+def test_slow_primary_is_hedged_and_cancelled_when_the_hedge_wins():
+    budget = HedgeBudget(max_rate=1.0)
+    log = []
+    result = asyncio.run(first_success(
+        call("primary", delay=5, log=log, name="primary"), call("hedge", delay=0.01), delay=0.01, budget=budget
+    ))
+    assert result == ("hedge", "hedge")
+    assert log == ["primary cancelled"]
+    assert budget.rate == 1.0
+
+
+def test_failed_hedge_falls_back_to_the_primary():
+    budget = HedgeBudget(max_rate=1.0)
+    result = asyncio.run(first_success(
+        call("primary", delay=0.05), call(error=RuntimeError("hedge down")), delay=0.01, budget=budget
+    ))
+    assert result == ("primary", "primary")
+
+
+def test_raises_when_both_fail():
+    budget = HedgeBudget(max_rate=1.0)
+    with pytest.raises(RuntimeError):
+        asyncio.run(first_success(
+            call(delay=0.02, error=RuntimeError("primary down")), call(error=RuntimeError("hedge down")),
+            delay=0.01, budget=budget
+        ))
+
+
+def test_exhausted_budget_skips_the_hedge():
+    budget = HedgeBudget(max_rate=0.0)
+    hedge_calls = []
+
+    async def hedge():
+        hedge_calls.append(1)
+
+    result = asyncio.run(first_success(call("primary", delay=0.02), hedge, delay=0.01, budget=budget))
+    assert result == ("primary", "primary")
+    assert not hedge_calls
+
+
+def test_budget_caps_the_hedged_share_of_the_window():
+    budget = HedgeBudget(max_rate=0.5, window=4)
+    assert budget.allows()
+    budget.record(True)
+    # One hedged call of one is over half
+    assert not budget.allows()
+    budget.record(False)
+    budget.record(False)
+    assert budget.allows()
+    assert budget.rate == pytest.approx(1 / 3)
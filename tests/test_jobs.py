@@ -0,0 +1,64 @@
+import asyncio
+
+from jobs import JobStore, job_key
+
+
+def outcome(model_class):
+    return {"text_content": "text", "model_result": {"class": model_class}}
+
+
+def start(store, key, result, calls, seconds=0.0):
+    """Submits a job that records its start in calls and returns (or raises) result after seconds."""
+    async def run(stats):
+        calls.append(key)
+        await asyncio.sleep(seconds)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return store.submit(key, run)
+
+
+def test_job_key_depends_on_document_and_model():
+    assert job_key(b"doc", "gpt-4o-mini") == job_key(b"doc", "gpt-4o-mini")
+    assert job_key(b"doc", "gpt-4o-mini") != job_key(b"doc", "Phi-4-multimodal-instruct")
+    assert job_key(b"doc", "gpt-4o-mini") != job_key(b"other", "gpt-4o-mini")
+
+
+def test_running_job_is_joined_not_restarted():
+    store, calls = JobStore(), []
+    first = start(store, "key", outcome("Error"), calls, seconds=0.2)
+    second = start(store, "key", outcome("Error"), calls)
+    assert second is first
+    first.future.result(timeout=5)
+    assert calls == ["key"]
+
+
+def test_finished_job_is_reused():
+    store, calls = JobStore(), []
+    first = start(store, "key", outcome("Judgment"), calls)
+    first.future.result(timeout=5)
+    assert start(store, "key", outcome("Judgment"), calls) is first
+    assert store.get("key") is first
+    assert calls == ["key"]
+
+
+def test_job_ending_in_an_error_result_is_restarted():
+    store, calls = JobStore(), []
+    first = start(store, "key", outcome("Error"), calls)
+    first.future.result(timeout=5)
+    assert first.errored and not first.failed
+
+    second = start(store, "key", outcome("Judgment"), calls)
+    assert second is not first
+    assert second.future.result(timeout=5) == outcome("Judgment")
+    assert store.get("key") is second
+    assert calls == ["key", "key"]
+
+
+def test_failed_job_is_restarted():
+    store, calls = JobStore(), []
+    first = start(store, "key", RuntimeError("OCR failed"), calls)
+    first.future.exception(timeout=5)
+    assert first.failed and first.errored
+
+    assert start(store, "key", outcome("Judgment"), calls) is not first
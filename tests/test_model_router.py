@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import model_router
+import resilience
+from classification import ModelResponseError
+from model_router import LatencyTracker, ModelRouter, result_confidence
+from resilience import get_endpoint
+from config import ROUTER_MIN_SAMPLES
+
+
+@pytest.fixture(autouse=True)
+def fresh_endpoints(monkeypatch):
+    monkeypatch.setattr(resilience, "_endpoints", {})
+
+
+def fake_classify(answers, calls):
+    """A classify coroutine function answering per model: a result dict, an exception to raise, or a delay."""
+    async def classify(text_content, model_name):
+        calls.append(model_name)
+        answer = answers[model_name]
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, float):
+            await asyncio.sleep(answer)
+        return dict(answer)
+    return classify
+
+
+def route(answers, models=("cheap", "strong"), tracker=None):
+    calls = []
+    router = ModelRouter(fake_classify(answers, calls), models=models, tracker=tracker or LatencyTracker())
+    return asyncio.run(router.classify("document text")), calls
+
+
+def test_confident_cheap_answer_is_not_escalated():
+    result, calls = route({"cheap": {"class": "Other", "confidence": 0.9}, "strong": {}})
+    assert calls == ["cheap"]
+    assert result["model"] == "cheap"
+    assert result["routing"] == [{"model": "cheap", "outcome": "ok", "confidence": 0.9}]
+
+
+def test_unconfident_answer_escalates_and_keeps_the_most_confident():
+    result, calls = route({
+        "cheap": {"class": "Other", "confidence": 0.3},
+        "strong": {"class": "Summons", "confidence": 0.8}
+    })
+    assert calls == ["cheap", "strong"]
+    assert result["class"] == "Summons"
+    assert result["model"] == "strong"
+
+
+def test_best_answer_is_returned_when_no_model_is_confident():
+    result, _ = route({
+        "cheap": {"class": "Judgment", "confidence": 0.6},
+        "strong": {"class": "Other", "confidence": 0.4}
+    })
+    assert result["class"] == "Judgment"
+    assert [attempt["outcome"] for attempt in result["routing"]] == ["ok", "ok"]
+
+
+def test_invalid_and_failed_answers_fail_over_to_the_next_model():
+    result, calls = route({
+        "cheap": ModelResponseError("not JSON", "Response is not valid JSON"),
+        "strong": {"class": "Other", "confidence": 0.9}
+    })
+    assert calls == ["cheap", "strong"]
+    assert result["routing"][0] == {"model": "cheap", "outcome": "invalid"}
+
+    result, _ = route({"cheap": ConnectionError("reset"), "strong": {"class": "Other", "confidence": 0.9}})
+    assert result["routing"][0] == {"model": "cheap", "outcome": "failed"}
+
+
+def test_timeout_fails_over_and_is_recorded_as_latency(monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTER_ATTEMPT_TIMEOUT", 0.01)
+    tracker = LatencyTracker()
+    result, _ = route({"cheap": 1.0, "strong": {"class": "Other", "confidence": 0.9}}, tracker=tracker)
+    assert result["routing"][0] == {"model": "cheap", "outcome": "timeout"}
+    assert list(tracker._samples["cheap"]) == [0.01]
+
+
+def test_last_error_is_raised_when_every_model_fails():
+    with pytest.raises(ModelResponseError):
+        route({"cheap": ConnectionError("reset"), "strong": ModelResponseError("not JSON", "Response is not valid JSON")})
+
+
+def test_missing_secrets_are_raised_without_failing_over():
+    with pytest.raises(KeyError):
+        route({"cheap": KeyError("AZURE_LLM_API_KEY"), "strong": {"class": "Other", "confidence": 0.9}})
+
+
+def test_candidates_try_slow_then_down_models_last(monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTER_SLOW_P95_SECONDS", 5)
+    tracker = LatencyTracker()
+    for _ in range(ROUTER_MIN_SAMPLES):
+        tracker.record("slow", 9.0)
+        tracker.record("fast", 1.0)
+    breaker = get_endpoint("llm:down").breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+    router = ModelRouter(None, models=["down", "slow", "fast"], tracker=tracker)
+    assert router.candidates() == ["fast", "slow", "down"]
+
+
+def test_latency_percentiles_need_enough_samples():
+    tracker = LatencyTracker()
+    for seconds in range(1, ROUTER_MIN_SAMPLES):
+        tracker.record("model", float(seconds))
+    assert tracker.percentile("model", 95) is None
+    tracker.record("model", 10.0)
+    assert tracker.percentile("model", 95) == 10.0
+    assert tracker.percentile("model", 50) == 3.0
+
+
+@pytest.mark.parametrize("result, expected", [({"confidence": "0.8"}, 0.8), ({"confidence": None}, 0.0), ({}, 0.0)])
+def test_result_confidence(result, expected):
+    assert result_confidence(result) == expected
@@ -0,0 +1,94 @@
+import pymupdf
+import pytest
+
+from pdf_pages import PageSelection, format_page_ranges, read_text_layer, select_pages
+
+
+LETTER = (
+    "Dear Sirs, we write regarding the road traffic accident on 3 May and enclose our client's statement. "
+    "Please confirm whether liability is admitted and let us have your insured's details within 21 days."
+)
+
+
+def make_pdf(page_texts):
+    """A PDF with the given text on each page; None leaves the page blank, as a scan without text layer."""
+    with pymupdf.open() as doc:
+        for text in page_texts:
+            page = doc.new_page()
+            if text:
+                page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), text)
+        return doc.tobytes()
+
+
+@pytest.mark.parametrize("page_numbers, expected", [
+    ([1, 2, 3, 7], "1-3,7"),
+    ([7, 3, 1, 2, 2], "1-3,7"),
+    ([4], "4"),
+    ([1, 3, 5, 6], "1,3,5-6"),
+    ([], "")
+])
+def test_format_page_ranges(page_numbers, expected):
+    assert format_page_ranges(page_numbers) == expected
+
+
+def test_select_pages_analyses_every_page_of_short_documents():
+    selection = select_pages([None] * 4)
+    assert selection.page_numbers is None
+    assert selection.remaining_pages() == []
+
+
+def test_select_pages_picks_leading_last_and_keyword_pages():
+    page_texts = [None] * 10
+    page_texts[5] = "Please find enclosed the sealed Claim Form."
+    selection = select_pages(page_texts)
+    assert selection.page_numbers == [1, 2, 3, 6, 10]
+    assert selection.remaining_pages() == [4, 5, 7, 8, 9]
+
+
+def test_selection_with_a_summons_keyword_is_confident():
+    selection = PageSelection([1, 2, 3, 10], 10, 0.0)
+    assert selection.is_confident("Please find enclosed the sealed Claim Form.")
+
+
+def test_selection_with_one_rule_decided_category_is_not_confident():
+    # The rules would decide Section 152 from this alone, but a skipped page may hold a Claim Form
+    selection = PageSelection([1, 2, 3, 10], 10, 0.0)
+    assert not selection.is_confident("Re: your client's RTA claim")
+
+
+def test_selection_with_several_categories_is_confident():
+    selection = PageSelection([1, 2, 3, 10], 10, 0.0)
+    assert selection.is_confident("Re: your client's RTA claim. Judgment for Claimant.")
+
+
+def test_selection_without_keywords_depends_on_text_layer_coverage():
+    assert not PageSelection([1, 2, 3, 10], 10, 0.0).is_confident("Dear Sirs")
+    assert PageSelection([1, 2, 3, 10], 10, 0.95).is_confident("Dear Sirs")
+
+
+def test_read_text_layer_returns_text_of_born_digital_pages_and_none_for_scans():
+    page_texts = read_text_layer(make_pdf([LETTER, None, "Page 3"]))
+    assert len(page_texts) == 3
+    assert "road traffic accident" in page_texts[0]
+    # Blank pages and pages with only a stamp or page number need OCR
+    assert page_texts[1] is None
+    assert page_texts[2] is None
+
+
+def test_read_text_layer_returns_none_for_images():
+    assert read_text_layer(b"\x89PNG\r\n\x1a\n") is None
+
+
+def test_select_pages_picks_among_the_scanned_pages_of_a_mixed_pdf():
+    # Pages 1-4 are born-digital; the scanned pages 5-12 are the candidates
+    page_texts = [LETTER] * 4 + [None] * 8
+    selection = select_pages(page_texts, candidates=range(5, 13))
+    assert selection.page_numbers == [5, 6, 7, 12]
+    assert selection.remaining_pages() == [8, 9, 10, 11]
+    assert selection.text_layer_coverage == pytest.approx(4 / 12)
+
+
+def test_select_pages_analyses_all_candidates_when_few_need_ocr():
+    selection = select_pages([LETTER] * 20 + [None] * 3, candidates=[21, 22, 23])
+    assert selection.page_numbers is None
+    assert selection.candidates == [21, 22, 23]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateGovernor, _MemoryStore, _SQLiteStore
+
+LIMITS = {"model": {"tokens_per_minute": 600, "requests_per_minute": 3}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    return now
+
+
+def test_requests_within_quota_do_not_wait(clock):
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    assert [governor.reserve("model", 100) for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_request_bucket_empties_and_refills(clock):
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    for _ in range(3):
+        governor.reserve("model", 10)
+    # One request refills every 20 seconds
+    assert governor.reserve("model", 10) == pytest.approx(20.0)
+    clock[0] += 20
+    assert governor.reserve("model", 10) == 0.0
+
+
+def test_token_bucket_limits_large_requests(clock):
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    assert governor.reserve("model", 500) == 0.0
+    # 100 tokens left; 300 more refill at 10 per second
+    assert governor.reserve("model", 400) == pytest.approx(30.0)
+
+
+def test_requests_larger_than_the_quota_are_capped(clock):
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    assert governor.reserve("model", 10_000) == 0.0
+
+
+def test_unlisted_models_are_not_throttled():
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    assert all(governor.reserve("other", 10**6) == 0.0 for _ in range(10))
+
+
+def test_sqlite_store_shares_buckets_between_governors(tmp_path, clock):
+    path = str(tmp_path / "buckets.db")
+    first = RateGovernor(LIMITS, _SQLiteStore(path))
+    second = RateGovernor(LIMITS, _SQLiteStore(path))
+    first.reserve("model", 10)
+    first.reserve("model", 10)
+    assert second.reserve("model", 10) == 0.0
+    assert first.reserve("model", 10) > 0
+
+
+def test_acquire_waits_for_the_quota(monkeypatch):
+    governor = RateGovernor(LIMITS, _MemoryStore())
+    waits = iter([5.0, 0.0])
+    monkeypatch.setattr(governor, "reserve", lambda model_name, tokens: next(waits))
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    asyncio.run(governor.acquire("model", 10))
+    assert slept == [5.0]
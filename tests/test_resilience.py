@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, Endpoint, is_transient, retry_after
+from config import RETRY_MAX_ATTEMPTS
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, error: 0)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_is_transient():
+    assert is_transient(StatusError(429))
+    assert is_transient(StatusError(503))
+    assert is_transient(ServiceRequestError("connection reset"))
+    assert is_transient(TimeoutError())
+    assert not is_transient(StatusError(400))
+    assert not is_transient(ValueError("bad answer"))
+
+
+def test_retry_after_reads_seconds_header():
+    assert retry_after(StatusError(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after(StatusError(429)) is None
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=60)
+    open_breaker(breaker)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_lets_one_trial_through_after_reset():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+
+    assert breaker.before_call() is True
+    # Only one trial at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.before_call() is False
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=0)
+    open_breaker(breaker)
+
+    assert breaker.before_call() is True
+    breaker.record_failure()
+    assert breaker.is_open
+    # The failed trial is over, so the next call (after the reset time) is the new trial
+    assert breaker.before_call() is True
+
+
+def test_call_retries_transient_errors():
+    endpoint = Endpoint("test")
+    outcomes = [StatusError(503), StatusError(429), "ok"]
+
+    def fn():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert endpoint.call(fn) == "ok"
+    assert not outcomes
+
+
+def test_call_raises_non_transient_errors_at_once():
+    endpoint = Endpoint("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise HttpResponseError(message="bad request")
+
+    with pytest.raises(HttpResponseError):
+        endpoint.call(fn)
+    assert len(calls) == 1
+
+
+def test_call_gives_up_after_max_attempts():
+    endpoint = Endpoint("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        endpoint.call(fn)
+    assert len(calls) == RETRY_MAX_ATTEMPTS
+
+
+def test_call_async_retries_transient_errors():
+    endpoint = Endpoint("test")
+    outcomes = [ServiceRequestError("reset"), "ok"]
+
+    async def fn():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(endpoint.call_async(fn)) == "ok"
+
+
+def test_cancelled_trial_releases_the_breaker():
+    endpoint = Endpoint("test")
+    endpoint.breaker.reset_seconds = 0
+    open_breaker(endpoint.breaker)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "ok"
+
+    async def main():
+        trial = asyncio.ensure_future(endpoint.call_async(slow))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # The next call becomes the trial instead of finding the circuit wedged open
+        return await endpoint.call_async(fast)
+
+    assert asyncio.run(main()) == "ok"
+    assert not endpoint.breaker.is_open
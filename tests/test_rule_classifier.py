@@ -0,0 +1,48 @@
+from rule_classifier import classify_with_rules, match_categories, result_model_name, rule_stats
+from config import RULE_CLASSIFIER_NAME
+
+
+def test_match_categories_reports_first_keyword_per_category():
+    text = "GENERAL FORM OF JUDGMENT OR ORDER ... Judgment for Claimant"
+    assert match_categories(text) == {"JUDGMENT": "general form of judgment or order"}
+
+
+def test_match_categories_ignores_spacing_and_punctuation_between_tokens():
+    for text in ("Under S.152 of the Act", "under s 152", "Section  152(1)a applies"):
+        assert "SOLICITOR_TP_S152" in match_categories(text)
+
+
+def test_match_categories_respects_word_boundaries():
+    assert match_categories("Reference XS152-A") == {}
+    assert match_categories("Section 1520") == {}
+
+
+def test_classify_with_rules_decides_a_single_decisive_category():
+    result = classify_with_rules("Please find enclosed the Judgment for Claimant dated 1 May.")
+    assert result["class"] == "Judgment"
+    assert result["confidence"] == 1.0
+    assert result["rule"] == "JUDGMENT: 'judgment for claimant'"
+
+
+def test_classify_with_rules_leaves_ambiguous_and_non_decisive_documents_to_the_llm():
+    # Two categories at once
+    assert classify_with_rules("Judgment for Claimant under Section 152") is None
+    # Summons needs the LLM for the defendant and date of service
+    assert classify_with_rules("We enclose a sealed Claim Form") is None
+    assert classify_with_rules("") is None
+    assert classify_with_rules(None) is None
+
+
+def test_rule_stats_count_rule_hits_and_llm_fallbacks():
+    before = rule_stats()
+    classify_with_rules("Section 152 notice")
+    classify_with_rules("Nothing decisive here")
+    after = rule_stats()
+    assert after.get("rule:Solicitor_TP_S152", 0) == before.get("rule:Solicitor_TP_S152", 0) + 1
+    assert after.get("llm", 0) == before.get("llm", 0) + 1
+
+
+def test_result_model_name():
+    assert result_model_name({"rule": "JUDGMENT: 'x'"}, "gpt-4o-mini") == RULE_CLASSIFIER_NAME
+    assert result_model_name({"model": "Phi-4-multimodal-instruct"}, "auto") == "Phi-4-multimodal-instruct"
+    assert result_model_name({}, "gpt-4o-mini") == "gpt-4o-mini"